@@ -1,13 +1,49 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, g
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
 from psycopg2 import sql
+from psycopg2 import extensions as pg_extensions
+from psycopg2.extras import execute_values
+import base64
+import click
+import csv
 import secrets
+import select
+import shutil
+import tempfile
 import hashlib
+import hmac
+import fcntl
+import bisect
+import re
+import random
+import cProfile
+import pstats
+import sys
 import json
+import logging
+import pickle
 import io
-from datetime import datetime, date
+import threading
+import multiprocessing
+import queue
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from urllib.parse import quote
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Frame, PageTemplate
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -15,8 +51,382 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
 
+# Optional: XLSX export is disabled without openpyxl
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+except ImportError:
+    Workbook = None
+
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_secret_key():
+    """Return SECRET_KEY from the environment, or the instance folder's key file.
+
+    The key file is created on first start. Every worker and every restart
+    must sign with the same key or all sessions are lost, so nodes behind a
+    load balancer need the same SECRET_KEY (or a shared SECRET_KEY_FILE).
+    """
+    if os.environ.get('SECRET_KEY'):
+        return os.environ['SECRET_KEY']
+
+    path = os.environ.get('SECRET_KEY_FILE', os.path.join(app.instance_path, 'secret_key'))
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.secret_key-')
+        try:
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(secrets.token_hex(32))
+            # link() fails if another worker got there first; its key wins
+            os.link(tmp_path, path)
+            logger.info(f"Generated a new secret key in {path}")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+
+    with open(path, encoding='ascii') as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"Secret key file {path} is empty")
+    return key
+
+
+app.secret_key = load_secret_key()
+
+# Reverse proxies in front of the app that append to X-Forwarded-For. With
+# 0 (no proxy) the header is ignored, as any client could forge it;
+# otherwise request.remote_addr, which the login throttle is keyed on, is
+# the address the outermost trusted proxy saw
+PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+if PROXY_FIX_X_FOR > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_X_FOR, x_proto=PROXY_FIX_X_FOR)
+
+# Largest request body accepted, in bytes; bulk CSV uploads are the
+# biggest legitimate ones
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_REQUEST_BYTES', 32 * 1024 * 1024))
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    response = jsonify({'success': False, 'message': 'Request is too large'})
+    response.status_code = 413
+    return response
+
+# Metrics
+# Counters, gauges and histograms served on /metrics in the Prometheus text
+# format. Each process keeps its own and writes them to METRICS_DIR every
+# METRICS_FLUSH_INTERVAL seconds; /metrics adds up every process's file, so
+# a scrape sees the whole server whichever worker answers it. Counts of
+# workers that have exited are folded into an archive file so they survive
+# worker recycling.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# Bearer token /metrics and /db_pool_stats require. PROFILE_TOKEN in
+# X-Profile is accepted too; with neither set, both answer 401
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ARCHIVE = 'archive.json'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+_metrics = {}  # name -> Metric, in registration order
+_metrics_collectors = []  # callables that set gauges just before a flush
+_metrics_lock = threading.Lock()
+_metrics_flusher_started = False
+
+
+class Metric:
+    """A counter, gauge or histogram family with fixed label names.
+
+    Values are keyed by the tuple of label values, passed positionally:
+    ``HTTP_REQUESTS.inc('GET', '/get_users', '200')``.
+    """
+
+    def __init__(self, name, kind, documentation, labels=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> number, or for histograms the per-bucket counts
+        # (the last one for +Inf) followed by the sum of observations
+        self.values = {}
+        _metrics[name] = self
+
+    def inc(self, *labels, amount=1):
+        if not METRICS_ENABLED:
+            return
+        ensure_metrics_flusher()
+        with _metrics_lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        with _metrics_lock:
+            self.values[labels] = value
+
+    def observe(self, value, *labels):
+        if not METRICS_ENABLED:
+            return
+        ensure_metrics_flusher()
+        index = bisect.bisect_left(self.buckets, value)
+        with _metrics_lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+
+HTTP_REQUESTS = Metric('http_requests_total', 'counter', 'HTTP requests handled',
+                       ('method', 'route', 'status'))
+HTTP_REQUEST_DURATION = Metric(
+    'http_request_duration_seconds', 'histogram',
+    'Time from receiving a request to sending the last byte of its response',
+    ('method', 'route'), LATENCY_BUCKETS)
+DB_QUERY_DURATION = Metric('db_query_duration_seconds', 'histogram',
+                           'Database statement execution time', ('statement',), LATENCY_BUCKETS)
+DB_POOL_WAIT = Metric('db_pool_checkout_wait_seconds', 'histogram',
+                      'Time spent waiting for a free pooled connection', (), LATENCY_BUCKETS)
+DB_POOL_HELD = Metric('db_pool_checkout_held_seconds', 'histogram',
+                      'Time a pooled connection stayed checked out', (), LATENCY_BUCKETS)
+DB_POOL_TIMEOUTS = Metric('db_pool_timeouts_total', 'counter',
+                          'Checkouts that gave up waiting for a connection')
+DB_POOL_CONNECTIONS = Metric('db_pool_connections', 'gauge',
+                             'Open pooled connections of live processes', ('state',))
+PDF_RENDER_DURATION = Metric('pdf_render_duration_seconds', 'histogram',
+                             'PDF report render time', ('report',), LATENCY_BUCKETS)
+PDF_RENDER_BYTES = Metric('pdf_render_bytes', 'histogram',
+                          'Size of rendered PDF reports', ('report',), SIZE_BUCKETS)
+EXPORT_ROWS = Metric('export_rows_total', 'counter', 'Rows written to CSV and XLSX exports',
+                     ('format', 'table'))
+
+
+def _reset_metrics():
+    global _metrics_flusher_started
+    for metric in _metrics.values():
+        metric.values = {}
+    _metrics_flusher_started = False
+
+
+# A forked worker starts from zero rather than re-reporting the master's counts
+os.register_at_fork(after_in_child=_reset_metrics)
+
+
+def ensure_metrics_flusher():
+    """Start this process's thread that writes its metrics to METRICS_DIR"""
+    global _metrics_flusher_started
+    if _metrics_flusher_started:
+        return
+    with _metrics_lock:
+        if _metrics_flusher_started:
+            return
+        _metrics_flusher_started = True
+    threading.Thread(target=_flush_metrics_periodically, name='metrics-flusher',
+                     daemon=True).start()
+
+
+def _flush_metrics_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush_metrics()
+        except Exception as e:
+            logger.error(f"Could not write metrics: {e}")
+
+
+def flush_metrics():
+    """Write this process's metrics to METRICS_DIR/<pid>.json"""
+    for collect in _metrics_collectors:
+        collect()
+    with _metrics_lock:
+        data = {metric.name: [[list(labels), value] for labels, value in metric.values.items()]
+                for metric in _metrics.values() if metric.values}
+    write_metrics_file(os.path.join(METRICS_DIR, f'{os.getpid()}.json'), data)
+
+
+def write_metrics_file(path, data):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    partial_path = f'{path}.{threading.get_ident()}.part'
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(partial_path, path)
+
+
+def read_metrics_file(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def add_metrics(totals, data, include_gauges):
+    for name, samples in data.items():
+        metric = _metrics.get(name)
+        if metric is None or (metric.kind == 'gauge' and not include_gauges):
+            continue
+        family = totals.setdefault(name, {})
+        for labels, value in samples:
+            labels = tuple(labels)
+            if metric.kind == 'histogram':
+                current = family.get(labels)
+                if current is None or len(current) != len(value):
+                    family[labels] = list(value)
+                else:
+                    family[labels] = [a + b for a, b in zip(current, value)]
+            else:
+                family[labels] = family.get(labels, 0) + value
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_metrics():
+    """Every process's metrics added up: ``{name: {label values: value}}``"""
+    flush_metrics()
+    totals = {}
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(METRICS_DIR, METRICS_ARCHIVE)
+        archive = read_metrics_file(archive_path)
+        add_metrics(totals, archive, include_gauges=False)
+        exited = []
+        for filename in os.listdir(METRICS_DIR):
+            pid, _, extension = filename.partition('.')
+            if not pid.isdigit() or extension != 'json':
+                continue
+            path = os.path.join(METRICS_DIR, filename)
+            data = read_metrics_file(path)
+            alive = process_alive(int(pid))
+            add_metrics(totals, data, include_gauges=alive)
+            if not alive:
+                exited.append((path, data))
+
+        if exited:
+            merged = {}
+            add_metrics(merged, archive, include_gauges=False)
+            for _, data in exited:
+                add_metrics(merged, data, include_gauges=False)
+            write_metrics_file(archive_path, {
+                name: [[list(labels), value] for labels, value in family.items()]
+                for name, family in merged.items()})
+            for path, _ in exited:
+                os.remove(path)
+    return totals
+
+
+def clear_metrics_dir():
+    """Forget the metrics of earlier runs; call once when the server starts"""
+    if os.path.isdir(METRICS_DIR):
+        for filename in os.listdir(METRICS_DIR):
+            if filename.endswith('.json'):
+                os.remove(os.path.join(METRICS_DIR, filename))
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def render_metrics(totals):
+    """Prometheus text exposition of collect_metrics() output"""
+    lines = []
+    for metric in _metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in sorted(totals.get(metric.name, {}).items()):
+            if metric.kind != 'histogram':
+                lines.append(f'{metric.name}{format_labels(metric.labels, labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*map(float, metric.buckets), '+Inf'], value[:-1]):
+                cumulative += count
+                bucket_labels = format_labels((*metric.labels, 'le'), (*labels, bound))
+                lines.append(f'{metric.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{metric.name}_sum{format_labels(metric.labels, labels)} {value[-1]}')
+            lines.append(f'{metric.name}_count{format_labels(metric.labels, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+STATEMENT_TYPES = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY', 'CREATE', 'ALTER',
+                   'DROP', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'LOCK', 'LISTEN'}
+
+
+def statement_type(query):
+    """Leading keyword of a query (psycopg2.sql objects included), for metric labels"""
+    while isinstance(query, sql.Composed):
+        query = query.seq[0] if query.seq else ''
+    if isinstance(query, sql.SQL):
+        query = query.string
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    match = re.match(r'[\s(]*([A-Za-z]+)', query) if isinstance(query, str) else None
+    keyword = match.group(1).upper() if match else ''
+    return keyword if keyword in STATEMENT_TYPES else 'OTHER'
+
+
+# Statements run by the current thread while its request is being profiled
+# (see start_request_profile); unset otherwise
+_profile_local = threading.local()
+PROFILE_STATEMENT_MAX_CHARS = 2000
+
+
+class TimedCursor(pg_extensions.cursor):
+    """Cursor that records every statement's duration in DB_QUERY_DURATION"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(started, statement_type(query), query)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(started, statement_type(query), query)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._record(started, 'COPY', sql)
+
+    def _record(self, started, statement, query):
+        elapsed = time.perf_counter() - started
+        DB_QUERY_DURATION.observe(elapsed, statement)
+        statements = getattr(_profile_local, 'statements', None)
+        if statements is not None:
+            # self.query is the statement as sent, parameters included
+            text = self.query if statement != 'COPY' and self.query else query
+            if isinstance(text, bytes):
+                text = text.decode('utf-8', 'replace')
+            elif not isinstance(text, str):
+                text = text.as_string(self)
+            statements.append({'statement': statement, 'seconds': elapsed,
+                               'sql': text[:PROFILE_STATEMENT_MAX_CHARS]})
+
 
 # Database configuration
 DB_CONFIG = {
@@ -27,6 +437,16 @@ DB_CONFIG = {
     'database': 'bini_database'
 }
 
+# Connection pool configuration (per worker process)
+DB_POOL_CONFIG = {
+    'minconn': int(os.environ.get('DB_POOL_MIN', 2)),
+    'maxconn': int(os.environ.get('DB_POOL_MAX', 20)),
+    # Seconds a request waits for a free connection before giving up
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    # Idle connections older than this many seconds are pinged before reuse
+    'healthcheck_after': float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', 30)),
+}
+
 # Register fonts
 
 
@@ -39,27 +459,27 @@ def register_fonts():
     try:
         if os.path.exists(font_path):
             pdfmetrics.registerFont(TTFont('Amharic', font_path))
-            print("✅ Amharic font registered successfully!")
+            logger.info("Amharic font registered successfully!")
             fonts_registered = True
         else:
-            print("❌ Amharic font not found at:", os.path.abspath(font_path))
+            logger.warning("Amharic font not found at: %s", os.path.abspath(font_path))
             # List files in fonts directory for debugging
             fonts_dir = 'static/fonts'
             if os.path.exists(fonts_dir):
-                print("📁 Files in fonts directory:", os.listdir(fonts_dir))
+                logger.warning("Files in fonts directory: %s", os.listdir(fonts_dir))
             else:
-                print("❌ Fonts directory does not exist")
+                logger.warning("Fonts directory does not exist")
     except Exception as e:
-        print(f"❌ Error registering Amharic font: {e}")
+        logger.error(f"Error registering Amharic font: {e}")
 
     # Always register default fonts as fallback
     try:
         # These are built-in ReportLab fonts that should always work
         pdfmetrics.registerFont(TTFont('Helvetica', 'Helvetica'))
         pdfmetrics.registerFont(TTFont('Helvetica-Bold', 'Helvetica-Bold'))
-        print("✅ Default fonts registered")
+        logger.info("Default fonts registered")
     except:
-        print("⚠️  Using built-in fonts")
+        logger.debug("Using built-in fonts")
 
     return fonts_registered
 
@@ -68,536 +488,2876 @@ def register_fonts():
 amharic_font_available = register_fonts()
 
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of PostgreSQL connections.
+
+    Keeps at most ``maxconn`` connections open, hands out the most recently
+    returned idle connection first and makes callers wait up to ``timeout``
+    seconds when every connection is busy. Connections that sat idle for
+    longer than ``healthcheck_after`` seconds are pinged before reuse.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_after, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.pid = os.getpid()
+        self.closed = False
+        self._connect_kwargs = connect_kwargs
+        self._idle = []  # (connection, returned_at) pairs, newest last
+        self._size = 0  # open connections, idle and checked out
+        self._cond = threading.Condition()
+        self.stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'checkout_seconds_total': 0.0,
+            'checkout_seconds_max': 0.0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
         # Set encoding to support Amharic
         conn.set_client_encoding('UTF8')
+        with self._cond:
+            self.stats['connections_created'] += 1
         return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
 
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-
-def initialize_database():
-    """Initialize the database with required tables"""
-    conn = get_db_connection()
-    if conn:
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.stats['connections_discarded'] += 1
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.healthcheck_after:
+            return True
         try:
             cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
 
-            # Create system_users table if not exists
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS system_users (
-                    id SERIAL PRIMARY KEY,
-                    username VARCHAR(100) UNIQUE NOT NULL,
-                    password VARCHAR(100) NOT NULL,
-                    email VARCHAR(100),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+    def warm(self):
+        """Open ``minconn`` connections up front so the first requests don't pay for them"""
+        conns = []
+        try:
+            while len(conns) < self.minconn:
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise PoolTimeout('Connection pool is closed')
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, returned_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    DB_POOL_TIMEOUTS.inc()
+                    raise PoolTimeout(
+                        f'No database connection free after {self.timeout}s '
+                        f'({self.maxconn} in use)')
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - started
+            DB_POOL_WAIT.observe(waited)
+            self.stats['checkouts'] += 1
+            self.stats['wait_seconds_total'] += waited
+            self.stats['wait_seconds_max'] = max(
+                self.stats['wait_seconds_max'], waited)
+
+        # Connecting and pinging happen outside the lock so a slow server
+        # doesn't stall every other thread waiting on the pool
+        try:
+            if conn is not None and not self._is_healthy(conn, returned_at):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return conn
 
-            # Create user_table_permissions table if not exists
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS user_table_permissions (
-                    id SERIAL PRIMARY KEY,
-                    username VARCHAR(100) NOT NULL,
-                    table_name VARCHAR(100) NOT NULL,
-                    can_read BOOLEAN DEFAULT TRUE,
-                    can_write BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(username, table_name)
-                )
-            ''')
+    def putconn(self, conn, held_seconds=0.0):
+        # Return the connection in a clean state: anything left uncommitted
+        # by the borrower is rolled back rather than leaking to the next one
+        if not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status == pg_extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != pg_extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                conn.close()
 
-            # Create table_dropdown_options table if not exists
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS table_dropdown_options (
-                    id SERIAL PRIMARY KEY,
-                    table_name VARCHAR(100) NOT NULL,
-                    column_name VARCHAR(100) NOT NULL,
-                    option_value VARCHAR(255) NOT NULL,
-                    option_label VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(table_name, column_name, option_value)
-                )
-            ''')
+        if conn.closed or self.closed:
+            self._discard(conn)
+        DB_POOL_HELD.observe(held_seconds)
+        with self._cond:
+            self.stats['checkout_seconds_total'] += held_seconds
+            self.stats['checkout_seconds_max'] = max(
+                self.stats['checkout_seconds_max'], held_seconds)
+            if conn.closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        """Current pool counters, safe to serialise as JSON"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+            })
+        return stats
 
-            conn.commit()
-            cur.close()
-            conn.close()
-            print("Database initialization completed successfully")
 
-        except Exception as e:
-            print(f"Error initializing database: {e}")
-            if conn:
-                conn.rollback()
-    else:
-        print("Failed to connect to database for initialization")
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
 
-# Initialize database when the app starts
-print("Starting database initialization...")
-initialize_database()
+def get_db_pool():
+    """Return this process's connection pool, creating it on first use.
 
+    The pool is tied to the process that created it: a forked worker gets a
+    fresh pool instead of sharing the parent's sockets.
+    """
+    global _db_pool
+    pid = os.getpid()
+    if _db_pool is None or _db_pool.pid != pid:
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool.pid != pid:
+                pool = ConnectionPool(**DB_POOL_CONFIG, **DB_CONFIG,
+                                      cursor_factory=TimedCursor)
+                try:
+                    pool.warm()
+                except (psycopg2.Error, PoolTimeout) as e:
+                    # Connections are opened on demand instead
+                    logger.warning(f"Could not open {pool.minconn} database connections up front: {e}")
+                _db_pool = pool
+    return _db_pool
 
-@app.route('/')
-def index():
-    return render_template('index.html')
 
+def init_helper_process():
+    """ProcessPoolExecutor initializer of the export and report render processes.
 
-@app.route('/admin')
-def admin():
-    return render_template('admin.html')
+    Each uses one connection at a time, so its pool opens none up front;
+    DB_POOL_MIN idle connections in every one of them would add up to more
+    than the web workers' own.
+    """
+    DB_POOL_CONFIG['minconn'] = 0
 
 
-@app.route('/user_login')
-def user_login():
-    return render_template('user_login.html')
+def collect_pool_metrics():
+    pool = _db_pool
+    if pool is not None and pool.pid == os.getpid():
+        stats = pool.snapshot()
+        DB_POOL_CONNECTIONS.set(stats['in_use'], 'in_use')
+        DB_POOL_CONNECTIONS.set(stats['idle'], 'idle')
 
 
-@app.route('/user_dashboard')
-def user_dashboard():
-    if 'user_id' not in session:
-        return redirect('/user_login')
-    return render_template('user_dashboard.html')
+_metrics_collectors.append(collect_pool_metrics)
 
 
-@app.route('/login', methods=['POST'])
-def login():
-    data = request.json
-    username = data.get('username')
-    password = data.get('password')
+def close_db_pool():
+    """Close every idle connection of this process's pool"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None and _db_pool.pid == os.getpid():
+            _db_pool.closeall()
+        _db_pool = None
 
-    # Ensure database is initialized
-    initialize_database()
 
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, username, password FROM system_users WHERE username = %s",
-                (username,)
-            )
-            user = cur.fetchone()
-            cur.close()
-            conn.close()
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a ``with`` block.
 
-            if user and user[2] == hash_password(password):
-                session['user_id'] = user[0]
-                session['username'] = user[1]
-                return jsonify({'success': True, 'message': 'Login successful!'})
-            else:
-                return jsonify({'success': False, 'message': 'Invalid username or password'})
+    Yields ``None`` when no connection can be obtained, so callers keep their
+    "Database connection failed" handling. The connection goes back to the
+    pool (rolled back if left mid-transaction) when the block exits.
+    """
+    pool = get_db_pool()
+    try:
+        conn = pool.getconn()
+    except Exception as e:
+        logger.error(f"Database connection error: {e}")
+        conn = None
 
-        except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
+    checked_out_at = time.monotonic()
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            pool.putconn(conn, time.monotonic() - checked_out_at)
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
 
+# Password hashing
+# Stored hashes are "<scheme>$<parameters>$<salt>$<hash>". Hashes without
+# a scheme are the unsalted SHA-256 hex digests of older releases; they are
+# still accepted and replaced with a current hash at the next login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+# scrypt cost: CPU and memory both grow with N (128 * N * r bytes per hash).
+# See benchmarks/bench_password_hash.py for picking it.
+PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000))
+PASSWORD_SALT_BYTES = 16
 
-@app.route('/logout')
-def logout():
-    session.clear()
-    return redirect('/')
 
+def b64encode_nopad(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
 
-@app.route('/create_user', methods=['POST'])
-def create_user():
-    data = request.json
-    username = data.get('username')
-    password = data.get('password')
-    email = data.get('email')
 
-    # Ensure database is initialized before creating user
-    initialize_database()
+def b64decode_nopad(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
 
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
 
-            # Insert the user with hashed password
-            hashed_password = hash_password(password)
-            cur.execute(
-                "INSERT INTO system_users (username, password, email) VALUES (%s, %s, %s)",
-                (username, hashed_password, email)
-            )
+class ScryptHasher:
+    scheme = 'scrypt'
 
-            conn.commit()
-            cur.close()
-            conn.close()
+    def __init__(self, n=None, r=None, p=None):
+        self.n = n or PASSWORD_SCRYPT_N
+        self.r = r or PASSWORD_SCRYPT_R
+        self.p = p or PASSWORD_SCRYPT_P
 
-            return jsonify({'success': True, 'message': f'User {username} created successfully!'})
+    def params(self):
+        return f'{self.n},{self.r},{self.p}'
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({'success': False, 'message': str(e)})
+    def derive(self, password, salt, params):
+        n, r, p = (int(value) for value in params.split(','))
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32)
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
 
+class Pbkdf2Hasher:
+    scheme = 'pbkdf2_sha256'
 
-@app.route('/create_table', methods=['POST'])
-def create_table():
-    data = request.json
-    table_name = data.get('tableName')
-    columns = data.get('columns', [])
-    assigned_user = data.get('assignedUser', '')
-    dropdown_options = data.get('dropdownOptions', {})
+    def __init__(self, iterations=None):
+        self.iterations = iterations or PASSWORD_PBKDF2_ITERATIONS
 
-    # Ensure database is initialized
-    initialize_database()
+    def params(self):
+        return str(self.iterations)
 
-    conn = get_db_connection()
+    def derive(self, password, salt, params):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, int(params))
 
-    if conn:
-        try:
-            cur = conn.cursor()
 
-            # Build column definitions
-            column_definitions = []
-            for col in columns:
-                col_name = col['name']
-                col_type = col['type']
-                column_definitions.append(f'"{col_name}" {col_type}')
-
-            # Create main table
-            create_table_query = f'''
-                CREATE TABLE IF NOT EXISTS "{table_name}" (
-                    id SERIAL PRIMARY KEY,
-                    {', '.join(column_definitions)},
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    submitted_by VARCHAR(100)
-                )
-            '''
-
-            cur.execute(create_table_query)
-
-            # Save dropdown options if any
-            for column_name, options in dropdown_options.items():
-                for option in options:
-                    if option['value'] and option['label']:
-                        cur.execute('''
-                            INSERT INTO table_dropdown_options 
-                            (table_name, column_name, option_value, option_label)
-                            VALUES (%s, %s, %s, %s)
-                            ON CONFLICT (table_name, column_name, option_value) 
-                            DO UPDATE SET option_label = EXCLUDED.option_label
-                        ''', (table_name, column_name, option['value'], option['label']))
-
-            # If a user is assigned to this table, create permission
-            if assigned_user:
-                cur.execute('''
-                    INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (username, table_name) 
-                    DO UPDATE SET can_write = EXCLUDED.can_write
-                ''', (assigned_user, table_name, True, True))
+PASSWORD_HASHERS = {hasher.scheme: hasher for hasher in (ScryptHasher, Pbkdf2Hasher)}
 
-            conn.commit()
-            cur.close()
-            conn.close()
 
-            return jsonify({'success': True, 'message': f'Table {table_name} created successfully in bini_database!'})
+@lru_cache(maxsize=None)
+def get_password_hasher(scheme=None):
+    """The hasher new passwords are hashed with (or the one for ``scheme``)"""
+    scheme = scheme or PASSWORD_HASHER
+    if scheme not in PASSWORD_HASHERS:
+        raise ValueError(f"Unknown password hasher {scheme!r}")
+    return PASSWORD_HASHERS[scheme]()
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({'success': False, 'message': str(e)})
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
+def hash_password(password, hasher=None):
+    hasher = hasher or get_password_hasher()
+    salt = secrets.token_bytes(PASSWORD_SALT_BYTES)
+    params = hasher.params()
+    digest = hasher.derive(password, salt, params)
+    return f'{hasher.scheme}${params}${b64encode_nopad(salt)}${b64encode_nopad(digest)}'
 
 
-@app.route('/get_users')
-def get_users():
-    """Get all users for assignment dropdown"""
-    # Ensure database is initialized
-    initialize_database()
+def verify_password(password, stored):
+    """Check ``password`` against a stored hash in constant time.
+
+    Returns ``(matches, needs_rehash)``; ``needs_rehash`` is true when the
+    stored hash uses a legacy format, another scheme or other cost settings
+    than new hashes would.
+    """
+    if not stored:
+        return False, False
+    if '$' not in stored:
+        legacy = hashlib.sha256(password.encode('utf-8')).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+
+    try:
+        scheme, params, salt, digest = stored.split('$')
+        hasher = get_password_hasher(scheme)
+        matches = hmac.compare_digest(
+            hasher.derive(password, b64decode_nopad(salt), params), b64decode_nopad(digest))
+    except ValueError:
+        logger.error("Unreadable password hash in system_users")
+        return False, False
+    current = get_password_hasher()
+    return matches, (scheme, params) != (current.scheme, current.params())
+
+
+# Verified against when the username doesn't exist, so unknown and known
+# usernames take equally long to reject
+_dummy_password_hash = None
+
+
+def dummy_password_hash():
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_hex(16))
+    return _dummy_password_hash
+
+
+# Login throttling
+# Token buckets held per worker process: every attempt spends a token of the
+# client address's bucket, and every failure one of the username's. An
+# empty bucket turns the request away with 429 before the database or the
+# password hash is touched.
+LOGIN_RATE_PER_ADDRESS = int(os.environ.get('LOGIN_RATE_PER_ADDRESS', 30))  # attempts per minute
+LOGIN_FAILURES_PER_USER = int(os.environ.get('LOGIN_FAILURES_PER_USER', 5))  # failures per 5 minutes
+RATE_LIMITER_MAX_KEYS = 100000
+
+
+class RateLimiter:
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period  # tokens regained per second
+        self._buckets = {}  # key -> (tokens, monotonic time of last update)
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may try again; 0 if it may now"""
+        with self._lock:
+            tokens = self._tokens(key, time.monotonic())
+        return 0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def hit(self, key):
+        """Spend a token of ``key``; returns retry_after() as it was before"""
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            if len(self._buckets) >= RATE_LIMITER_MAX_KEYS:
+                self._prune(now)
+            self._buckets[key] = (tokens - 1, now)
+        return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def _prune(self, now):
+        # Full buckets carry no state; drop them
+        for key in [key for key in self._buckets
+                    if self._tokens(key, now) >= self.capacity]:
+            del self._buckets[key]
+
+
+login_address_limiter = RateLimiter(LOGIN_RATE_PER_ADDRESS, 60)
+login_user_limiter = RateLimiter(LOGIN_FAILURES_PER_USER, 300)
+
+
+def too_many_attempts(retry_after):
+    response = jsonify({'success': False,
+                        'message': 'Too many login attempts. Please try again later.'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(int(retry_after) + 1)
+    return response
+
+
+# Schema migrations
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# Arbitrary key for pg_advisory_lock so concurrent deploys apply migrations one at a time
+MIGRATION_LOCK_ID = 804213
+
+# Tables owned by the application rather than created through /create_table
+SYSTEM_TABLES = ['system_users', 'user_table_permissions',
+                 'table_dropdown_options', 'schema_migrations', 'report_jobs',
+                 'submission_stats', 'table_data_versions', 'user_sessions',
+                 'partitioned_tables']
+
+
+def load_migrations():
+    """Return (version, name, sql) for every script in migrations/, oldest first.
+
+    Scripts are named ``<version>_<name>.sql``, e.g. ``0001_initial_schema.sql``.
+    """
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith('.sql'):
+            continue
+        version, _, name = filename[:-4].partition('_')
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+            migrations.append((int(version), name, f.read()))
+    return migrations
+
+
+def get_applied_migrations(cur):
+    cur.execute("SELECT to_regclass('schema_migrations')")
+    if cur.fetchone()[0] is None:
+        return set()
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migrations():
+    """Apply every pending migration, each in its own transaction.
+
+    Returns the list of (version, name) pairs that were applied.
+    """
+    applied_now = []
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
 
-    conn = get_db_connection()
-    if conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
         try:
-            cur = conn.cursor()
-            cur.execute("SELECT username FROM system_users ORDER BY username")
-            users = [row[0] for row in cur.fetchall()]
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'users': users})
-        except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
+            applied = get_applied_migrations(cur)
+            for version, name, script in load_migrations():
+                if version in applied:
+                    continue
+                logger.info(f"Applying migration {version:04d}_{name}...")
+                try:
+                    cur.execute(script)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied_now.append((version, name))
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            conn.commit()
+            cur.close()
 
+    return applied_now
 
-@app.route('/get_tables')
-def get_tables():
-    """Get all tables (for admin)"""
-    # Ensure database is initialized
-    initialize_database()
 
-    conn = get_db_connection()
-    if conn:
-        try:
+@app.cli.command('migrate')
+@click.option('--status', is_flag=True, help='List applied and pending migrations without applying anything.')
+def migrate_command(status):
+    """Apply pending database migrations."""
+    if status:
+        with db_connection() as conn:
+            if not conn:
+                raise click.ClickException('Database connection failed')
             cur = conn.cursor()
-            cur.execute("""
-                SELECT table_name FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-                AND table_name NOT IN ('system_users', 'user_table_permissions', 'table_dropdown_options')
-                ORDER BY table_name
-            """)
-            tables = [row[0] for row in cur.fetchall()]
+            applied = get_applied_migrations(cur)
+            cur.close()
+        for version, name, _ in load_migrations():
+            state = 'applied' if version in applied else 'pending'
+            click.echo(f"{version:04d}_{name}: {state}")
+        return
+
+    applied_now = apply_migrations()
+    if applied_now:
+        for version, name in applied_now:
+            click.echo(f"Applied {version:04d}_{name}")
+    else:
+        click.echo("Database schema is up to date")
+
+
+# Server-side sessions
+# The session cookie carries only a signed random id. The data lives in the
+# user_sessions table, so any worker on any node can serve any user, and
+# logging out ends the session everywhere.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'postgres')  # or 'cookie' (Flask's signed cookies)
+# Seconds of inactivity after which a session expires
+SESSION_LIFETIME = int(os.environ.get('SESSION_LIFETIME', 12 * 3600))
+# Expiry is pushed back at most this often rather than written on every request
+SESSION_REFRESH_INTERVAL = int(os.environ.get('SESSION_REFRESH_INTERVAL', 300))
+# Seconds between sweeps of expired sessions (per worker, run by logins)
+SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', 600))
+SESSION_SWEEP_BATCH = 1000
+
+SESSION_LOAD_QUERY = """
+    SELECT data, expires_at FROM user_sessions
+    WHERE session_id = %s AND expires_at > now()
+"""
+
+_next_session_sweep = 0.0
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.previous_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        """Move the session to a new id; call on login to prevent session fixation"""
+        if self.sid:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class PostgresSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+    salt = 'dashboard-session'
+
+    def get_signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def session_id(self, app, cookie):
+        """The session id signed into ``cookie``, or None if it isn't valid"""
+        if not cookie:
+            return None
+        try:
+            return self.get_signer(app).unsign(cookie).decode('ascii')
+        except (BadSignature, UnicodeDecodeError):
+            return None
+
+    def open_session(self, app, request):
+        sid = self.session_id(app, request.cookies.get(self.get_cookie_name(app)))
+        if sid:
+            with db_connection() as conn:
+                if conn:
+                    try:
+                        cur = conn.cursor()
+                        cur.execute(SESSION_LOAD_QUERY, (sid,))
+                        row = cur.fetchone()
+                        cur.close()
+                        if row:
+                            return ServerSideSession(self.serializer.loads(row[0]), sid, row[1])
+                    except Exception as e:
+                        logger.error(f"Session load error: {e}")
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid or session.previous_sid:
+                self.delete_sessions([session.sid, session.previous_sid])
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        now = datetime.now(timezone.utc)
+        stale = (session.expires_at is None or
+                 session.expires_at - now < timedelta(seconds=SESSION_LIFETIME - SESSION_REFRESH_INTERVAL))
+        if not (session.modified or stale):
+            return
+
+        new_session = session.sid is None
+        if new_session:
+            session.sid = secrets.token_urlsafe(32)
+        expires_at = now + timedelta(seconds=SESSION_LIFETIME)
+        with db_connection() as conn:
+            if not conn:
+                logger.error("Session not saved: database connection failed")
+                return
+            try:
+                cur = conn.cursor()
+                if session.previous_sid:
+                    cur.execute("DELETE FROM user_sessions WHERE session_id = %s",
+                                (session.previous_sid,))
+                cur.execute("""
+                    INSERT INTO user_sessions (session_id, data, expires_at)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (session_id)
+                    DO UPDATE SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+                """, (session.sid, self.serializer.dumps(dict(session)), expires_at))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Session save error: {e}")
+                return
+
+            if new_session:
+                try:
+                    sweep_expired_sessions(cur, due_only=True)
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Session sweep error: {e}")
             cur.close()
-            conn.close()
-            return jsonify({'success': True, 'tables': tables})
-        except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
-
-    return jsonify({'success': False, 'message': 'Database connection failed'})
 
+        session.expires_at = expires_at
+        if new_session or self.get_expiration_time(app, session):
+            response.set_cookie(
+                name, self.get_signer(app).sign(session.sid).decode('ascii'),
+                expires=self.get_expiration_time(app, session), httponly=httponly,
+                domain=domain, path=path, secure=secure, samesite=samesite)
+
+    def delete_sessions(self, sids):
+        sids = [sid for sid in sids if sid]
+        with db_connection() as conn:
+            if not conn:
+                logger.error("Session not deleted: database connection failed")
+                return
+            try:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM user_sessions WHERE session_id = ANY(%s)", (sids,))
+                conn.commit()
+                cur.close()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Session delete error: {e}")
+
+
+def sweep_expired_sessions(cur, due_only=False):
+    """Delete expired sessions in batches and return how many went.
+
+    With ``due_only``, run one batch at most every SESSION_SWEEP_INTERVAL
+    seconds per process. This lets logins keep the table trim without a
+    scheduler.
+    """
+    global _next_session_sweep
+    if due_only:
+        if time.monotonic() < _next_session_sweep:
+            return 0
+        _next_session_sweep = time.monotonic() + SESSION_SWEEP_INTERVAL
+
+    deleted = 0
+    while True:
+        cur.execute("""
+            DELETE FROM user_sessions WHERE session_id IN (
+                SELECT session_id FROM user_sessions WHERE expires_at <= now()
+                LIMIT %s FOR UPDATE SKIP LOCKED)
+        """, (SESSION_SWEEP_BATCH,))
+        cur.connection.commit()
+        deleted += cur.rowcount
+        if due_only or cur.rowcount < SESSION_SWEEP_BATCH:
+            return deleted
+
+
+if SESSION_BACKEND == 'postgres':
+    app.session_interface = PostgresSessionInterface()
+
+
+@app.cli.command('sweep-sessions')
+def sweep_sessions_command():
+    """Delete expired server-side sessions."""
+    with db_connection() as conn:
+        if not conn:
+            raise click.ClickException('Database connection failed')
+        cur = conn.cursor()
+        deleted = sweep_expired_sessions(cur)
+        cur.close()
+    click.echo(f"Deleted {deleted} expired sessions")
 
-@app.route('/get_user_tables')
-def get_user_tables():
-    """Get tables assigned to the logged-in user"""
-    if 'username' not in session:
-        return jsonify({'success': False, 'message': 'Not logged in'})
 
-    # Ensure database is initialized
-    initialize_database()
+# Cross-worker cache invalidation
+# Caches publish "<kind>:<key>" invalidations over Postgres NOTIFY so every
+# worker process drops its copy, not just the one that handled the change.
+# To flush by hand: SELECT pg_notify('dashboard_cache_invalidation', '{"kind": "schema", "key": null}')
+CACHE_INVALIDATION_CHANNEL = 'dashboard_cache_invalidation'
+CACHE_INVALIDATION_LISTEN = os.environ.get('CACHE_INVALIDATION_LISTEN', '1') == '1'
 
-    username = session['username']
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT table_name FROM user_table_permissions 
-                WHERE username = %s AND can_write = TRUE
-                ORDER BY table_name
-            """, (username,))
+# kind -> callable(key); a key of None means "drop everything of this kind"
+_invalidation_handlers = {}
+_invalidation_listener_pid = None
+_invalidation_listener_lock = threading.Lock()
 
-            tables = [row[0] for row in cur.fetchall()]
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'tables': tables})
-        except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
+def publish_invalidation(cur, kind, key):
+    """Queue a cache invalidation for other workers.
 
+    NOTIFY is transactional, so the message goes out when the caller's
+    transaction commits and is dropped if it rolls back.
+    """
+    payload = json.dumps({'kind': kind, 'key': key, 'pid': os.getpid()})
+    cur.execute("SELECT pg_notify(%s, %s)", (CACHE_INVALIDATION_CHANNEL, payload))
 
-@app.route('/get_table_columns/<table_name>')
-def get_table_columns(table_name):
-    """Get columns for a specific table"""
-    # Ensure database is initialized
-    initialize_database()
 
-    conn = get_db_connection()
-    if conn:
+def _dispatch_invalidation(payload):
+    try:
+        message = json.loads(payload)
+        handler = _invalidation_handlers.get(message.get('kind'))
+    except (ValueError, AttributeError):
+        logger.warning(f"Ignoring malformed cache invalidation: {payload!r}")
+        return
+    if handler:
+        handler(message.get('key'))
+
+
+def _listen_for_invalidations():
+    while True:
+        conn = None
         try:
+            conn = psycopg2.connect(**DB_CONFIG)
+            conn.set_isolation_level(pg_extensions.ISOLATION_LEVEL_AUTOCOMMIT)
             cur = conn.cursor()
-            cur.execute("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = %s 
-                    AND column_name NOT IN ('id', 'created_at', 'submitted_by')
-                ORDER BY ordinal_position
-            """, (table_name,))
-
-            columns = [{'name': row[0], 'type': row[1]}
-                       for row in cur.fetchall()]
-
-            # Get dropdown options for each column
-            dropdown_options = {}
-            for column in columns:
-                cur.execute("""
-                    SELECT option_value, option_label 
-                    FROM table_dropdown_options 
-                    WHERE table_name = %s AND column_name = %s
-                    ORDER BY option_value
-                """, (table_name, column['name']))
-
-                options = cur.fetchall()
-                if options:
-                    dropdown_options[column['name']] = [
-                        {'value': row[0], 'label': row[1]} for row in options
-                    ]
-
-            cur.close()
-            conn.close()
-            return jsonify({
-                'success': True,
-                'columns': columns,
-                'dropdownOptions': dropdown_options
-            })
+            cur.execute(sql.SQL("LISTEN {}").format(
+                sql.Identifier(CACHE_INVALIDATION_CHANNEL)))
+
+            # Anything published while we weren't listening is lost, so
+            # start from empty caches after every (re)connect, then fill
+            # the schema cache again now that no change can slip past
+            for handler in list(_invalidation_handlers.values()):
+                handler(None)
+            warm_caches()
+
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _dispatch_invalidation(conn.notifies.pop(0).payload)
         except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
-
-    return jsonify({'success': False, 'message': 'Database connection failed'})
-
-
-@app.route('/submit_form_data', methods=['POST'])
-def submit_form_data():
-    data = request.json
-    table_name = data.get('tableName')
-    form_data = data.get('formData', {})
+            logger.error(f"Cache invalidation listener error: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+        time.sleep(5)
+
+
+def start_invalidation_listener():
+    """Start this process's NOTIFY listener thread if it isn't running yet"""
+    global _invalidation_listener_pid
+    pid = os.getpid()
+    if not CACHE_INVALIDATION_LISTEN or _invalidation_listener_pid == pid:
+        return
+    with _invalidation_listener_lock:
+        if _invalidation_listener_pid == pid:
+            return
+        _invalidation_listener_pid = pid
+        threading.Thread(target=_listen_for_invalidations,
+                         name='cache-invalidation-listener', daemon=True).start()
+
+
+@app.before_request
+def ensure_invalidation_listener():
+    start_invalidation_listener()
+
+
+# Table schema registry
+# Column metadata of dynamic tables, read from information_schema once per
+# table and kept until /create_table (or a NOTIFY) invalidates it
+SYSTEM_COLUMNS = ('id', 'created_at', 'submitted_by')
+
+_table_schemas = {}
+_form_definitions = {}  # table -> columns, dropdown options and etag
+_table_schemas_generation = 0
+_table_schemas_lock = threading.Lock()
+
+
+TABLE_SCHEMA_QUERY = """
+    SELECT column_name, data_type, ordinal_position,
+           character_maximum_length, numeric_precision, numeric_scale
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = %s
+    ORDER BY ordinal_position
+"""
+
+
+def table_schema_from_rows(rows):
+    return [{'name': row[0], 'type': row[1], 'position': row[2],
+             'max_length': row[3],
+             'precision': row[4] if row[1] == 'numeric' else None,
+             'scale': row[5] if row[1] == 'numeric' else None}
+            for row in rows]
+
+
+def cache_table_schema(table_name, schema, generation):
+    """Cache a schema loaded at ``generation`` unless it was invalidated meanwhile"""
+    with _table_schemas_lock:
+        # Don't cache a result an invalidation raced with
+        if schema and generation == _table_schemas_generation:
+            _table_schemas[table_name] = schema
+
+
+def get_table_schema(cur, table_name):
+    """Return the columns of ``table_name`` in ordinal order.
+
+    Each column is a dict with ``name``, ``type``, ``position``, and the
+    ``max_length``, ``precision`` and ``scale`` limits (None where the type
+    has none); the system columns (id, created_at, submitted_by) are
+    included. Returns an empty list, uncached, for tables that don't exist.
+    """
+    schema = _table_schemas.get(table_name)
+    if schema is not None:
+        return schema
+
+    generation = _table_schemas_generation
+    cur.execute(TABLE_SCHEMA_QUERY, (table_name,))
+    schema = table_schema_from_rows(cur.fetchall())
+    cache_table_schema(table_name, schema, generation)
+    return schema
+
+
+def get_form_columns(cur, table_name):
+    """Columns of ``table_name`` that users fill in (system columns excluded)"""
+    return [col for col in get_table_schema(cur, table_name)
+            if col['name'] not in SYSTEM_COLUMNS]
+
+
+FORM_DROPDOWN_OPTIONS_QUERY = """
+    SELECT column_name,
+           json_agg(json_build_object('value', option_value, 'label', option_label)
+                    ORDER BY option_value)
+    FROM table_dropdown_options
+    WHERE table_name = %s
+    GROUP BY column_name
+"""
+
+
+def build_form_definition(form_columns, dropdown_rows):
+    """Form definition from the form columns and ``(column_name, options)`` rows"""
+    columns = [{'name': col['name'], 'type': col['type']} for col in form_columns]
+    column_names = {col['name'] for col in columns}
+    dropdown_options = {column_name: options
+                        for column_name, options in dropdown_rows
+                        if column_name in column_names}
+    body = json.dumps([columns, dropdown_options], sort_keys=True, ensure_ascii=False)
+    return {
+        'columns': columns,
+        'dropdownOptions': dropdown_options,
+        'etag': hashlib.sha1(body.encode('utf-8')).hexdigest(),
+    }
+
+
+def cache_form_definition(table_name, definition, generation):
+    with _table_schemas_lock:
+        if definition['columns'] and generation == _table_schemas_generation:
+            _form_definitions[table_name] = definition
+
+
+def get_form_definition(table_name):
+    """Return the cached form definition served by /get_table_columns.
+
+    The definition holds the user-facing ``columns``, their
+    ``dropdownOptions`` (loaded with one grouped query per table) and an
+    ``etag`` over both. A database connection is only borrowed on a miss.
+    """
+    definition = _form_definitions.get(table_name)
+    if definition is not None:
+        return definition
+
+    generation = _table_schemas_generation
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        cur = conn.cursor()
+        form_columns = get_form_columns(cur, table_name)
+        cur.execute(FORM_DROPDOWN_OPTIONS_QUERY, (table_name,))
+        definition = build_form_definition(form_columns, cur.fetchall())
+        cur.close()
+
+    cache_form_definition(table_name, definition, generation)
+    return definition
+
+
+def invalidate_table_schema(table_name=None):
+    """Drop the cached schema and form definition of ``table_name`` (or of every table if None)"""
+    global _table_schemas_generation
+    with _table_schemas_lock:
+        _table_schemas_generation += 1
+        if table_name is None:
+            _table_schemas.clear()
+            _form_definitions.clear()
+        else:
+            _table_schemas.pop(table_name, None)
+            _form_definitions.pop(table_name, None)
 
-    # Check if user has permission to write to this table
-    if 'username' not in session:
-        return jsonify({'success': False, 'message': 'Not logged in'})
 
-    # Ensure database is initialized
-    initialize_database()
+_invalidation_handlers['schema'] = invalidate_table_schema
 
-    username = session['username']
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
 
-            # Check user permissions
-            cur.execute("""
-                SELECT can_write FROM user_table_permissions 
-                WHERE username = %s AND table_name = %s
-            """, (username, table_name))
+# Permission cache
+# Each user's grants are loaded with one query and kept for
+# PERMISSION_CACHE_TTL seconds, so authorization on the submit path is a
+# dict lookup. Grant changes publish a 'permissions' invalidation, and the
+# TTL bounds staleness should a notification ever be missed
+PERMISSION_CACHE_TTL = float(os.environ.get('PERMISSION_CACHE_TTL', 60))
 
-            permission = cur.fetchone()
-            if not permission or not permission[0]:
-                return jsonify({'success': False, 'message': 'You do not have permission to submit data to this table'})
+_user_permissions = {}  # username -> (expires_at, {table_name: grant})
+_user_permissions_generation = 0
+_user_permissions_lock = threading.Lock()
 
-            # Get column information (excluding system columns)
-            cur.execute("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = %s AND column_name NOT IN ('id', 'created_at', 'submitted_by')
-            """, (table_name,))
-
-            columns = cur.fetchall()
-
-            # Prepare insert query
-            column_names = [col[0] for col in columns]
-            column_names.append('submitted_by')
-            placeholders = ['%s'] * len(column_names)
-            values = []
-
-            # Convert values based on data type
-            for col_name, data_type in columns:
-                value = form_data.get(col_name, '')
-                if 'int' in data_type and value:
-                    try:
-                        values.append(int(value))
-                    except:
-                        values.append(0)
-                elif 'bool' in data_type:
-                    values.append(bool(value))
-                else:
-                    # Handle Amharic text by ensuring proper encoding
-                    values.append(str(value))
 
-            # Add submitted_by value
-            values.append(username)
+def get_user_permissions(username, cur=None):
+    """Return the user's grants as ``{table_name: {'can_read': bool, 'can_write': bool}}``.
 
-            insert_query = f'''
-                INSERT INTO "{table_name}" ({', '.join([f'"{col}"' for col in column_names])})
-                VALUES ({', '.join(placeholders)})
-            '''
+    Tables are in name order. On a miss the grants are read with ``cur``
+    if given, otherwise on a connection borrowed for the purpose. The
+    returned dict is shared; don't modify it.
+    """
+    permissions = cached_user_permissions(username)
+    if permissions is not None:
+        return permissions
 
-            cur.execute(insert_query, values)
-            conn.commit()
+    generation = _user_permissions_generation
+    if cur is not None:
+        permissions = load_user_permissions(cur, username)
+    else:
+        with db_connection() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cur = conn.cursor()
+            permissions = load_user_permissions(cur, username)
             cur.close()
-            conn.close()
+    cache_user_permissions(username, permissions, generation)
+    return permissions
 
-            return jsonify({'success': True, 'message': 'Form data submitted successfully!'})
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({'success': False, 'message': str(e)})
+USER_PERMISSIONS_QUERY = """
+    SELECT table_name, can_read, can_write FROM user_table_permissions
+    WHERE username = %s
+    ORDER BY table_name
+"""
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
 
+def load_user_permissions(cur, username):
+    """The user's grants as stored now, bypassing the cache"""
+    cur.execute(USER_PERMISSIONS_QUERY, (username,))
+    return permissions_from_rows(cur.fetchall())
 
-@app.route('/get_user_submissions')
-def get_user_submissions():
-    if 'username' not in session:
-        return jsonify({'success': False, 'message': 'Not logged in'})
 
-    # Ensure database is initialized
-    initialize_database()
+def cached_user_permissions(username):
+    """The user's cached grants if they haven't expired, else None"""
+    entry = _user_permissions.get(username)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    return None
 
-    username = session['username']
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
 
-            # Get tables user has permission to access
-            cur.execute("""
-                SELECT table_name FROM user_table_permissions 
-                WHERE username = %s
-            """, (username,))
-            user_tables = [row[0] for row in cur.fetchall()]
-
-            submissions = []
-            for table in user_tables:
-                cur.execute(f'''
-                    SELECT id, created_at FROM "{table}" 
-                    WHERE submitted_by = %s ORDER BY created_at DESC
-                ''', (username,))
-
-                user_records = cur.fetchall()
-                for record in user_records:
-                    submissions.append({
-                        'table': table,
-                        'record_id': record[0],
-                        'submitted_at': record[1].strftime('%Y-%m-%d %H:%M:%S')
-                    })
+def permissions_from_rows(rows):
+    return {row[0]: {'can_read': bool(row[1]), 'can_write': bool(row[2])}
+            for row in rows}
 
-            cur.close()
-            conn.close()
-            return jsonify({'success': True, 'submissions': submissions})
 
-        except Exception as e:
-            return jsonify({'success': False, 'message': str(e)})
+def cache_user_permissions(username, permissions, generation):
+    with _user_permissions_lock:
+        # Don't cache a result an invalidation raced with
+        if generation == _user_permissions_generation:
+            _user_permissions[username] = (
+                time.monotonic() + PERMISSION_CACHE_TTL, permissions)
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
 
+def has_table_permission(username, table_name, permission, cur=None):
+    """True if the user holds ``permission`` ('can_read' or 'can_write') on the table"""
+    grant = get_user_permissions(username, cur).get(table_name)
+    return bool(grant and grant[permission])
 
-@app.route('/assign_table_to_user', methods=['POST'])
-def assign_table_to_user():
-    """Assign a table to a user"""
-    data = request.json
-    username = data.get('username')
-    table_name = data.get('tableName')
 
-    # Ensure database is initialized
-    initialize_database()
+def invalidate_user_permissions(username=None):
+    """Drop the cached grants of ``username`` (or of every user if None)"""
+    global _user_permissions_generation
+    with _user_permissions_lock:
+        _user_permissions_generation += 1
+        if username is None:
+            _user_permissions.clear()
+        else:
+            _user_permissions.pop(username, None)
 
-    conn = get_db_connection()
-    if conn:
-        try:
-            cur = conn.cursor()
 
-            cur.execute('''
-                INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (username, table_name) 
-                DO UPDATE SET can_write = EXCLUDED.can_write
-            ''', (username, table_name, True, True))
+_invalidation_handlers['permissions'] = invalidate_user_permissions
 
-            conn.commit()
-            cur.close()
-            conn.close()
 
-            return jsonify({'success': True, 'message': f'Table {table_name} assigned to user {username} successfully!'})
+def warm_caches():
+    """Load the schema of every dynamic table into the registry.
 
-        except Exception as e:
-            conn.rollback()
-            return jsonify({'success': False, 'message': str(e)})
+    The invalidation listener runs this each time it starts listening, so
+    a worker's requests find the schemas cached.
+    """
+    with db_connection() as conn:
+        if not conn:
+            logger.warning("Database connection failed; starting with cold caches")
+            return
+        cur = conn.cursor()
+        tables = list_dynamic_tables(cur)
+        for table_name in tables:
+            get_table_schema(cur, table_name)
+        cur.close()
+    logger.info(f"Cached the schema of {len(tables)} tables")
+
+
+# Dynamic table provisioning
+# Indexes every table created through /create_table gets, as (name suffix,
+# indexed columns). The submission list and the exporters all filter on
+# submitted_by and read newest first.
+DYNAMIC_TABLE_INDEXES = [
+    ('submitted_by_created_at', 'submitted_by, created_at DESC, id DESC'),
+    ('created_at_id', 'created_at DESC, id DESC'),
+]
+
+
+# Partitions of partitioned form tables are left out: the dashboards only
+# ever address the partitioned table itself
+DYNAMIC_TABLES_QUERY = """
+    SELECT c.relname FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+    AND c.relname <> ALL(%s)
+    ORDER BY c.relname
+"""
+
+
+def list_dynamic_tables(cur):
+    """Names of all tables created through /create_table"""
+    cur.execute(DYNAMIC_TABLES_QUERY, (SYSTEM_TABLES,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def dynamic_relation_name(table_name, suffix, ending=''):
+    """``<table_name>_<suffix><ending>``, shortened to fit Postgres' 63-byte
+    identifiers. A shortened name keeps ``ending`` and as much of the table
+    name as fits, with a hash of the full name in between."""
+    name = f'{table_name}_{suffix}{ending}'
+    if len(name.encode('utf-8')) <= 63:
+        return name
+    tail = '_' + hashlib.sha1(name.encode('utf-8')).hexdigest()[:10] + ending
+    prefix = table_name.encode('utf-8')[:63 - len(tail)].decode('utf-8', 'ignore')
+    return prefix + tail
+
+
+def dynamic_index_name(table_name, suffix):
+    """Index name for ``table_name``, shortened to fit Postgres' 63-byte identifiers"""
+    return dynamic_relation_name(table_name, suffix, '_idx')
+
+
+def create_dynamic_table_indexes(cur, table_name, concurrently=False):
+    """Create any missing standard indexes on ``table_name``.
+
+    With ``concurrently`` the indexes are built without blocking inserts;
+    the connection must then be in autocommit mode.
+    """
+    if concurrently and is_partitioned_table(cur, table_name):
+        create_partitioned_table_indexes(cur, table_name)
+        return
+
+    for suffix, columns in DYNAMIC_TABLE_INDEXES:
+        cur.execute(sql.SQL("CREATE INDEX {concurrently} IF NOT EXISTS {name} ON {table} ({columns})").format(
+            concurrently=sql.SQL('CONCURRENTLY' if concurrently else ''),
+            name=sql.Identifier(dynamic_index_name(table_name, suffix)),
+            table=sql.Identifier(table_name),
+            columns=sql.SQL(columns)))
+
+
+def create_partitioned_table_indexes(cur, table_name):
+    """Create missing standard indexes on a partitioned table without blocking inserts.
+
+    Postgres can't build an index on a partitioned table concurrently. So
+    the index is made on the parent alone (instant, and invalid until
+    complete), and each partition's is built concurrently and attached to
+    it. Running this again finishes an index an interrupted run left invalid.
+    """
+    for suffix, columns in DYNAMIC_TABLE_INDEXES:
+        index_name = dynamic_index_name(table_name, suffix)
+        cur.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON ONLY {} ({})").format(
+            sql.Identifier(index_name), sql.Identifier(table_name), sql.SQL(columns)))
+        # Every partition (the DEFAULT one too) without an index attached to it
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_inherits ii JOIN pg_index x ON x.indexrelid = ii.inhrelid
+                WHERE ii.inhparent = to_regclass(%s) AND x.indrelid = c.oid)
+        """, (sql.Identifier(table_name).as_string(cur),
+              sql.Identifier(index_name).as_string(cur)))
+        for partition_name, in cur.fetchall():
+            partition_index = dynamic_index_name(partition_name, suffix)
+            cur.execute("""
+                SELECT NOT i.indisvalid FROM pg_index i
+                WHERE i.indexrelid = to_regclass(%s)
+            """, (sql.Identifier(partition_index).as_string(cur),))
+            row = cur.fetchone()
+            if row and row[0]:
+                cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                    sql.Identifier(partition_index)))
+            cur.execute(sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ({})").format(
+                sql.Identifier(partition_index), sql.Identifier(partition_name),
+                sql.SQL(columns)))
+            cur.execute(sql.SQL("ALTER INDEX {} ATTACH PARTITION {}").format(
+                sql.Identifier(index_name), sql.Identifier(partition_index)))
+
+
+@app.cli.command('backfill-indexes')
+def backfill_indexes_command():
+    """Add the standard indexes to existing dynamic tables without blocking writes."""
+    with db_connection() as conn:
+        if not conn:
+            raise click.ClickException('Database connection failed')
+        cur = conn.cursor()
+        tables = list_dynamic_tables(cur)
+        conn.commit()
+
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        conn.autocommit = True
+        for table_name in tables:
+            # A concurrent build that was interrupted leaves an INVALID index
+            # behind, which IF NOT EXISTS would happily keep; rebuild those.
+            # Partitioned tables' indexes are completed instead
+            for suffix, _ in ([] if is_partitioned_table(cur, table_name)
+                              else DYNAMIC_TABLE_INDEXES):
+                index_name = dynamic_index_name(table_name, suffix)
+                cur.execute("""
+                    SELECT NOT i.indisvalid FROM pg_index i
+                    WHERE i.indexrelid = to_regclass(%s)
+                """, (sql.Identifier(index_name).as_string(conn),))
+                row = cur.fetchone()
+                if row and row[0]:
+                    click.echo(f"Dropping invalid index {index_name}")
+                    cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(
+                        sql.Identifier(index_name)))
 
-    return jsonify({'success': False, 'message': 'Database connection failed'})
+            try:
+                create_dynamic_table_indexes(cur, table_name, concurrently=True)
+                click.echo(f"Indexed {table_name}")
+            except psycopg2.Error as e:
+                click.echo(f"Failed to index {table_name}: {e}", err=True)
+        cur.close()
+
+
+# Submission statistics
+# submission_stats holds per-table, per-submitter, per-day row counts,
+# maintained by statement-level triggers (see migrations/0003), so
+# summaries cost one lookup per table instead of a scan of its rows
+SUBMISSION_STATS_TRIGGERS = [
+    ('submission_stats_insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+    ('submission_stats_update', 'UPDATE',
+     'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('submission_stats_delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+]
+
+
+def create_submission_stats_triggers(cur, table_name):
+    """Attach the submission_stats triggers to a dynamic table (idempotent)"""
+    for trigger_name, event, referencing in SUBMISSION_STATS_TRIGGERS:
+        cur.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(
+            sql.Identifier(trigger_name), sql.Identifier(table_name)))
+        cur.execute(sql.SQL("""
+            CREATE TRIGGER {} AFTER {} ON {} {}
+            FOR EACH STATEMENT EXECUTE FUNCTION submission_stats_apply()
+        """).format(sql.Identifier(trigger_name), sql.SQL(event),
+                    sql.Identifier(table_name), sql.SQL(referencing)))
+
+
+def get_user_table_stats(cur, username):
+    """Record counts of the user's own submissions in each table they can access.
+
+    Returns dicts with ``table_name``, ``total``, ``today``, ``last_7_days``
+    and ``last_submission`` (a date, or None), ordered by table name.
+    """
+    cur.execute("""
+        SELECT p.table_name,
+               COALESCE(SUM(s.record_count), 0)::bigint,
+               COALESCE(SUM(s.record_count) FILTER (WHERE s.day = CURRENT_DATE), 0)::bigint,
+               COALESCE(SUM(s.record_count) FILTER (WHERE s.day > CURRENT_DATE - 7), 0)::bigint,
+               MAX(s.day)
+        FROM user_table_permissions p
+        LEFT JOIN submission_stats s
+          ON s.table_name = p.table_name AND s.submitted_by = p.username
+         AND s.record_count > 0
+        WHERE p.username = %s
+        GROUP BY p.table_name
+        ORDER BY p.table_name
+    """, (username,))
+    return [{'table_name': row[0], 'total': row[1], 'today': row[2],
+             'last_7_days': row[3], 'last_submission': row[4]}
+            for row in cur.fetchall()]
+
+
+# Admin overview
+# submission_stats is already the per-table, per-submitter, per-day
+# rollup, kept current by the triggers, so the overview sums it instead
+# of counting rows. Each process reuses its last answer for up to
+# ADMIN_OVERVIEW_MAX_AGE seconds, so a page left open costs no queries
+ADMIN_OVERVIEW_DAYS = int(os.environ.get('ADMIN_OVERVIEW_DAYS', 30))
+ADMIN_OVERVIEW_MAX_AGE = float(os.environ.get('ADMIN_OVERVIEW_MAX_AGE', 60))
+ADMIN_OVERVIEW_TOP_SUBMITTERS = 10
+
+_admin_overview = None
+_admin_overview_at = 0.0
+_admin_overview_lock = threading.Lock()
+
+
+def get_admin_overview(cur, days):
+    """City-wide submission activity over every dynamic table.
+
+    Returns per-table counts (``total``, ``today``, ``last_7_days``,
+    ``recent`` for the last ``days`` days, ``submitters`` active in that
+    window, ``last_submission``), the daily city-wide totals of the window
+    oldest first, and the most active submitters in it. Reads only
+    submission_stats, so the cost grows with days of activity, not rows.
+    """
+    tables = list_dynamic_tables(cur)
+    cur.execute("""
+        SELECT t.table_name,
+               COALESCE(SUM(s.record_count), 0)::bigint,
+               COALESCE(SUM(s.record_count) FILTER (WHERE s.day = CURRENT_DATE), 0)::bigint,
+               COALESCE(SUM(s.record_count) FILTER (WHERE s.day > CURRENT_DATE - 7), 0)::bigint,
+               COALESCE(SUM(s.record_count) FILTER (WHERE s.day > CURRENT_DATE - %s), 0)::bigint,
+               COUNT(DISTINCT s.submitted_by) FILTER (WHERE s.day > CURRENT_DATE - %s),
+               MAX(s.day)
+        FROM unnest(%s::text[]) AS t(table_name)
+        LEFT JOIN submission_stats s
+          ON s.table_name = t.table_name AND s.record_count > 0
+        GROUP BY t.table_name
+        ORDER BY t.table_name
+    """, (days, days, tables))
+    table_stats = [{'table_name': row[0], 'total': row[1], 'today': row[2],
+                    'last_7_days': row[3], 'recent': row[4], 'submitters': row[5],
+                    'last_submission': row[6]}
+                   for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT day, SUM(record_count)::bigint
+        FROM submission_stats
+        WHERE day > CURRENT_DATE - %s AND table_name = ANY(%s)
+        GROUP BY day
+    """, (days, tables))
+    counts = dict(cur.fetchall())
+    cur.execute("SELECT CURRENT_DATE")
+    today = cur.fetchone()[0]
+    daily = [{'day': day, 'records': counts.get(day, 0)}
+             for day in (today - timedelta(days=offset) for offset in range(days - 1, -1, -1))]
+
+    # COUNT(*) OVER () is taken before the LIMIT: every active submitter
+    cur.execute("""
+        SELECT submitted_by, SUM(record_count)::bigint, COUNT(DISTINCT table_name),
+               COUNT(*) OVER ()
+        FROM submission_stats
+        WHERE day > CURRENT_DATE - %s AND table_name = ANY(%s) AND record_count > 0
+        GROUP BY submitted_by
+        ORDER BY 2 DESC, 1
+        LIMIT %s
+    """, (days, tables, ADMIN_OVERVIEW_TOP_SUBMITTERS))
+    rows = cur.fetchall()
+    top_submitters = [{'username': row[0], 'records': row[1], 'tables': row[2]} for row in rows]
+
+    return {
+        'tables': table_stats,
+        'daily': daily,
+        'top_submitters': top_submitters,
+        'active_submitters': rows[0][3] if rows else 0,
+    }
+
+
+@app.cli.command('backfill-stats')
+def backfill_stats_command():
+    """Attach the submission_stats triggers to every dynamic table and recount it."""
+    with db_connection() as conn:
+        if not conn:
+            raise click.ClickException('Database connection failed')
+        cur = conn.cursor()
+        tables = list_dynamic_tables(cur)
+        conn.commit()
+
+        for table_name in tables:
+            try:
+                # SHARE mode lets reads through but holds writes back until
+                # the triggers are in place, so no row is missed or counted twice
+                cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(
+                    sql.Identifier(table_name)))
+                create_submission_stats_triggers(cur, table_name)
+                cur.execute("DELETE FROM submission_stats WHERE table_name = %s", (table_name,))
+                cur.execute(sql.SQL("""
+                    INSERT INTO submission_stats (table_name, submitted_by, day, record_count)
+                    SELECT %s, submitted_by, created_at::date, COUNT(*)
+                    FROM {}
+                    WHERE submitted_by IS NOT NULL AND created_at IS NOT NULL
+                    GROUP BY 2, 3
+                """).format(sql.Identifier(table_name)), (table_name,))
+                conn.commit()
+                click.echo(f"Counted {table_name}")
+            except psycopg2.Error as e:
+                conn.rollback()
+                click.echo(f"Failed to count {table_name}: {e}", err=True)
+        cur.close()
+
+
+# Partitioned form tables
+# /create_table can range-partition a high-volume form on created_at, one
+# partition per day, month or year, so queries for recent rows only read
+# recent partitions. maintain_partitions keeps partitions `premake`
+# periods ahead and retires those past the table's retention. A DEFAULT
+# partition catches rows no partition covers yet; maintenance moves them
+# into the partitions it creates for them. Policies live in
+# partitioned_tables (see migrations/0008)
+PARTITION_INTERVALS = ('day', 'month', 'year')
+PARTITION_RETENTION_ACTIONS = ('archive', 'drop')
+PARTITION_PREMAKE = int(os.environ.get('PARTITION_PREMAKE', 3))
+# Most periods a table may create ahead (see the CHECK in migrations/0008)
+PARTITION_MAX_PREMAKE = 60
+# Seconds between the checks each worker runs in the background, so the
+# coming partitions exist even if maintain-partitions isn't scheduled.
+# They only create partitions; retiring is left to the command. 0: off
+PARTITION_CHECK_INTERVAL = int(os.environ.get('PARTITION_CHECK_INTERVAL', 3600))
+# Retired partitions are detached into this schema when archiving
+PARTITION_ARCHIVE_SCHEMA = os.environ.get('PARTITION_ARCHIVE_SCHEMA', 'archive')
+# With the table name's hash, key for pg_advisory_xact_lock so maintenance
+# of one table never runs twice at once
+PARTITION_LOCK_ID = 804214
+PARTITION_SUFFIX_FORMATS = {'day': '%Y%m%d', 'month': '%Y%m', 'year': '%Y'}
+
+
+def shift_period(interval, start, periods):
+    """Start of the period ``periods`` after (or before) the one starting at ``start``"""
+    if interval == 'day':
+        return start + timedelta(days=periods)
+    if interval == 'month':
+        months = start.year * 12 + start.month - 1 + periods
+        return start.replace(year=months // 12, month=months % 12 + 1)
+    return start.replace(year=start.year + periods)
+
+
+def partition_name(table_name, interval, start):
+    return dynamic_relation_name(table_name, 'p', '_' + start.strftime(PARTITION_SUFFIX_FORMATS[interval]))
+
+
+def default_partition_name(table_name):
+    return dynamic_relation_name(table_name, 'default')
+
+
+def is_partitioned_table(cur, table_name):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)",
+                (sql.Identifier(table_name).as_string(cur),))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def table_partitions(cur, table_name):
+    """``(name, start, end)`` of each range partition of a table, oldest first"""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (sql.Identifier(table_name).as_string(cur),))
+    partitions = []
+    for name, bound in cur.fetchall():
+        # FOR VALUES FROM ('2025-01-01 00:00:00') TO ('2025-02-01 00:00:00'), or DEFAULT
+        match = re.match(r"FOR VALUES FROM \('([^']+)'\) TO \('([^']+)'\)", bound)
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)),
+                               datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def get_partition_policies(cur, table_name=None):
+    cur.execute("""
+        SELECT table_name, partition_interval, premake, retention_periods, retention_action
+        FROM partitioned_tables
+        WHERE %(table_name)s IS NULL OR table_name = %(table_name)s
+        ORDER BY table_name
+    """, {'table_name': table_name})
+    return [{'table_name': row[0], 'interval': row[1], 'premake': row[2],
+             'retention': row[3], 'retention_action': row[4]}
+            for row in cur.fetchall()]
+
+
+def parse_partitioning(options):
+    """Validate /create_table's ``partitioning`` option into a policy dict.
+
+    ``options`` is None (a plain table) or ``{"interval": "month",
+    "premake": 3, "retention": 24, "retentionAction": "archive"}``, where
+    only ``interval`` is required. Raises ValueError if it is malformed.
+    """
+    if not options:
+        return None
+    if not isinstance(options, dict) or options.get('interval') not in PARTITION_INTERVALS:
+        raise ValueError(f"Partition interval must be one of {', '.join(PARTITION_INTERVALS)}")
+    premake = options.get('premake', PARTITION_PREMAKE)
+    retention = options.get('retention')
+    action = options.get('retentionAction') or 'archive'
+    if (not isinstance(premake, int) or isinstance(premake, bool)
+            or not 0 <= premake <= PARTITION_MAX_PREMAKE):
+        raise ValueError(f'Partitions to create ahead must be a whole number '
+                         f'from 0 to {PARTITION_MAX_PREMAKE}')
+    if retention is not None and (not isinstance(retention, int) or isinstance(retention, bool)
+                                  or retention < 1):
+        raise ValueError('Retention must be a whole number of periods of at least 1')
+    if action not in PARTITION_RETENTION_ACTIONS:
+        raise ValueError(f"Retention action must be one of {', '.join(PARTITION_RETENTION_ACTIONS)}")
+    return {'interval': options['interval'], 'premake': premake,
+            'retention': retention, 'retention_action': action}
+
+
+def register_partitioned_table(cur, table_name, policy):
+    """Record a new partitioned table's policy and give it its first partitions"""
+    if not is_partitioned_table(cur, table_name):
+        raise ValueError(f'Table {table_name} already exists and is not partitioned')
+    cur.execute("""
+        INSERT INTO partitioned_tables
+            (table_name, partition_interval, premake, retention_periods, retention_action)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (table_name) DO NOTHING
+    """, (table_name, policy['interval'], policy['premake'], policy['retention'],
+          policy['retention_action']))
+    cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT").format(
+        sql.Identifier(default_partition_name(table_name)), sql.Identifier(table_name)))
+    # The stored policy, in case the table was registered before
+    stored_policy, = get_partition_policies(cur, table_name)
+    maintain_table_partitions(cur, stored_policy, retire=False)
+
+
+def create_partition(cur, table_name, interval, start):
+    """Add the partition for the period starting at ``start``.
+
+    Rows of that period that landed in the DEFAULT partition are moved
+    into it first; Postgres refuses to add a partition the DEFAULT
+    partition holds rows for. Moving rows between partitions directly
+    doesn't fire the table's triggers, so submission_stats stays as is.
+    """
+    name = partition_name(table_name, interval, start)
+    lower = datetime.combine(start, datetime.min.time())
+    upper = datetime.combine(shift_period(interval, start, 1), datetime.min.time())
+    cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(
+        sql.Identifier(name), sql.Identifier(table_name)))
+    cur.execute(sql.SQL("""
+        WITH moved AS (
+            DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *
+        )
+        INSERT INTO {partition} SELECT * FROM moved
+    """).format(default=sql.Identifier(default_partition_name(table_name)),
+                partition=sql.Identifier(name)), (lower, upper))
+    if cur.rowcount:
+        logger.info(f"Moved {cur.rowcount} rows of {table_name} into {name}")
+    # Attaching adds the parent's indexes to the new partition
+    cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(
+        sql.Identifier(table_name), sql.Identifier(name)), (lower, upper))
+    return name
+
+
+def retire_partition(cur, table_name, name, lower, upper, action):
+    """Archive or drop a partition past its table's retention.
+
+    Neither fires the table's triggers, so the partition's days are taken
+    out of submission_stats here, and its submitters' data versions bumped
+    so cached reports that showed the rows are rendered afresh.
+    """
+    cur.execute("""
+        UPDATE table_data_versions SET version = version + 1
+        WHERE table_name = %s AND submitted_by IN (
+            SELECT submitted_by FROM submission_stats
+            WHERE table_name = %s AND day >= %s AND day < %s AND record_count > 0)
+    """, (table_name, table_name, lower.date(), upper.date()))
+    cur.execute("DELETE FROM submission_stats WHERE table_name = %s AND day >= %s AND day < %s",
+                (table_name, lower.date(), upper.date()))
+
+    if action == 'drop':
+        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        return
+    cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+        sql.Identifier(table_name), sql.Identifier(name)))
+    # The id default points at the table's sequence, which would then
+    # keep the table from being dropped
+    cur.execute(sql.SQL("ALTER TABLE {} ALTER COLUMN id DROP DEFAULT").format(sql.Identifier(name)))
+    cur.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(
+        sql.Identifier(PARTITION_ARCHIVE_SCHEMA)))
+    cur.execute(sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+        sql.Identifier(name), sql.Identifier(PARTITION_ARCHIVE_SCHEMA)))
+
+
+def maintain_table_partitions(cur, policy, retire=True):
+    """Bring one partitioned table in line with its policy.
+
+    Creates the partitions for the current period, the next ``premake``
+    ones and any period with rows waiting in the DEFAULT partition. With
+    ``retire``, archives or drops partitions that ended more than
+    ``retention`` periods before the current one. Returns the names of the
+    partitions created and retired. The caller commits.
+    """
+    table_name, interval = policy['table_name'], policy['interval']
+    cur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", (PARTITION_LOCK_ID, table_name))
+    cur.execute("SELECT date_trunc(%s, LOCALTIMESTAMP)::date", (interval,))
+    current = cur.fetchone()[0]
+
+    wanted = {shift_period(interval, current, offset) for offset in range(policy['premake'] + 1)}
+    cur.execute(sql.SQL("SELECT DISTINCT date_trunc(%s, created_at)::date FROM {}").format(
+        sql.Identifier(default_partition_name(table_name))), (interval,))
+    waiting = {row[0] for row in cur.fetchall()}
+    if waiting:
+        # Moving them out holds locks on the table; they shouldn't pile up
+        logger.warning(f"Rows of {len(waiting)} periods of {table_name} were waiting in its "
+                       f"DEFAULT partition; run maintain-partitions daily")
+    wanted.update(waiting)
+
+    existing = {start.date() for _, start, _ in table_partitions(cur, table_name)}
+    created = [create_partition(cur, table_name, interval, start)
+               for start in sorted(wanted - existing)]
+
+    retired = []
+    if retire and policy['retention']:
+        cutoff = datetime.combine(shift_period(interval, current, -policy['retention']),
+                                  datetime.min.time())
+        for name, lower, upper in table_partitions(cur, table_name):
+            if upper <= cutoff:
+                retire_partition(cur, table_name, name, lower, upper, policy['retention_action'])
+                retired.append(name)
+    return created, retired
+
+
+def maintain_partitions(retire=True):
+    """Run maintain_table_partitions for every partitioned table, one transaction each.
+
+    Returns whether every table was maintained.
+    """
+    with db_connection() as conn:
+        if not conn:
+            logger.error("Database connection failed; partitions not maintained")
+            return False
+        cur = conn.cursor()
+        policies = get_partition_policies(cur)
+        conn.commit()
+        ok = True
+        for policy in policies:
+            try:
+                created, retired = maintain_table_partitions(cur, policy, retire)
+                conn.commit()
+            except psycopg2.Error as e:
+                conn.rollback()
+                logger.error(f"Partition maintenance of {policy['table_name']} failed: {e}")
+                ok = False
+                continue
+            for name in created:
+                logger.info(f"Created partition {name}")
+            for name in retired:
+                logger.info(f"Retired partition {name} ({policy['retention_action']})")
+        cur.close()
+    return ok
+
+
+_next_partition_check = 0.0
+_partition_check_lock = threading.Lock()
+
+
+@app.before_request
+def schedule_partition_check():
+    """Create due partitions in a background thread every PARTITION_CHECK_INTERVAL"""
+    global _next_partition_check
+    if PARTITION_CHECK_INTERVAL <= 0 or time.monotonic() < _next_partition_check:
+        return
+    with _partition_check_lock:
+        if time.monotonic() < _next_partition_check:
+            return
+        _next_partition_check = time.monotonic() + PARTITION_CHECK_INTERVAL
+    threading.Thread(target=maintain_partitions, kwargs={'retire': False},
+                     name='partition-check', daemon=True).start()
+
+
+@app.cli.command('maintain-partitions')
+@click.option('--no-retire', is_flag=True, help='Only create partitions; keep old ones.')
+def maintain_partitions_command(no_retire):
+    """Create upcoming partitions and archive or drop expired ones. Run daily."""
+    if not maintain_partitions(retire=not no_retire):
+        raise click.ClickException('Some tables could not be maintained; see the log')
+
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+
+@app.route('/admin')
+def admin():
+    return render_template('admin.html')
+
+
+@app.route('/user_login')
+def user_login():
+    return render_template('user_login.html')
+
+
+@app.route('/user_dashboard')
+def user_dashboard():
+    if 'user_id' not in session:
+        return redirect('/user_login')
+    return render_template('user_dashboard.html')
+
+
+@app.route('/login', methods=['POST'])
+def login():
+    data = request.json
+    username = data.get('username')
+    password = data.get('password')
+    if not isinstance(username, str) or not isinstance(password, str):
+        return jsonify({'success': False, 'message': 'Invalid username or password'})
+
+    retry_after = (login_address_limiter.hit(request.remote_addr) or
+                   login_user_limiter.retry_after(username))
+    if retry_after:
+        logger.warning(f"Login throttled for {username!r} from {request.remote_addr}")
+        return too_many_attempts(retry_after)
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT id, username, password FROM system_users WHERE username = %s",
+                    (username,)
+                )
+                user = cur.fetchone()
+
+                matches, needs_rehash = verify_password(
+                    password, user[2] if user else dummy_password_hash())
+                if user and matches and needs_rehash:
+                    # Only replace the hash we checked, in case it changed meanwhile
+                    try:
+                        cur.execute(
+                            "UPDATE system_users SET password = %s WHERE id = %s AND password = %s",
+                            (hash_password(password), user[0], user[2]))
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        logger.error(f"Could not upgrade password hash of {username}: {e}")
+                cur.close()
+
+                if user and matches:
+                    login_user_limiter.reset(username)
+                    session.clear()
+                    if isinstance(session, ServerSideSession):
+                        session.regenerate()
+                    session['user_id'] = user[0]
+                    session['username'] = user[1]
+                    return jsonify({'success': True, 'message': 'Login successful!'})
+                else:
+                    login_user_limiter.hit(username)
+                    return jsonify({'success': False, 'message': 'Invalid username or password'})
+
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    return redirect('/')
+
+
+@app.route('/create_user', methods=['POST'])
+def create_user():
+    data = request.json
+    username = data.get('username')
+    password = data.get('password')
+    email = data.get('email')
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                # Insert the user with hashed password
+                hashed_password = hash_password(password)
+                cur.execute(
+                    "INSERT INTO system_users (username, password, email) VALUES (%s, %s, %s)",
+                    (username, hashed_password, email)
+                )
+
+                conn.commit()
+                cur.close()
+
+                return jsonify({'success': True, 'message': f'User {username} created successfully!'})
+
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/create_table', methods=['POST'])
+def create_table():
+    data = request.json
+    table_name = data.get('tableName')
+    columns = data.get('columns', [])
+    assigned_user = data.get('assignedUser', '')
+    dropdown_options = data.get('dropdownOptions', {})
+    try:
+        partitioning = parse_partitioning(data.get('partitioning'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                # Build column definitions
+                column_definitions = []
+                for col in columns:
+                    col_name = col['name']
+                    col_type = col['type']
+                    column_definitions.append(f'"{col_name}" {col_type}')
+
+                # Create main table
+                create_table_query = f'''
+                    CREATE TABLE IF NOT EXISTS "{table_name}" (
+                        id SERIAL PRIMARY KEY,
+                        {', '.join(column_definitions)},
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        submitted_by VARCHAR(100)
+                    )
+                '''
+
+                if partitioning:
+                    # The partition key must be part of the primary key
+                    create_table_query = f'''
+                        CREATE TABLE IF NOT EXISTS "{table_name}" (
+                            id SERIAL,
+                            {', '.join(column_definitions)},
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                            submitted_by VARCHAR(100),
+                            PRIMARY KEY (id, created_at)
+                        ) PARTITION BY RANGE (created_at)
+                    '''
+
+                cur.execute(create_table_query)
+                create_dynamic_table_indexes(cur, table_name)
+                create_submission_stats_triggers(cur, table_name)
+                if partitioning:
+                    register_partitioned_table(cur, table_name, partitioning)
+
+                # Save dropdown options if any
+                for column_name, options in dropdown_options.items():
+                    for option in options:
+                        if option['value'] and option['label']:
+                            cur.execute('''
+                                INSERT INTO table_dropdown_options 
+                                (table_name, column_name, option_value, option_label)
+                                VALUES (%s, %s, %s, %s)
+                                ON CONFLICT (table_name, column_name, option_value) 
+                                DO UPDATE SET option_label = EXCLUDED.option_label
+                            ''', (table_name, column_name, option['value'], option['label']))
+
+                # If a user is assigned to this table, create permission
+                if assigned_user:
+                    cur.execute('''
+                        INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (username, table_name) 
+                        DO UPDATE SET can_write = EXCLUDED.can_write
+                    ''', (assigned_user, table_name, True, True))
+
+                # Tell every worker to forget what it cached for this table
+                publish_invalidation(cur, 'schema', table_name)
+                if assigned_user:
+                    publish_invalidation(cur, 'permissions', assigned_user)
+
+                conn.commit()
+                cur.close()
+                invalidate_table_schema(table_name)
+                if assigned_user:
+                    invalidate_user_permissions(assigned_user)
+
+                return jsonify({'success': True, 'message': f'Table {table_name} created successfully in bini_database!'})
+
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/get_users')
+def get_users():
+    """Get all users for assignment dropdown"""
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT username FROM system_users ORDER BY username")
+                users = [row[0] for row in cur.fetchall()]
+                cur.close()
+                return jsonify({'success': True, 'users': users})
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/get_tables')
+def get_tables():
+    """Get all tables (for admin)"""
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                tables = list_dynamic_tables(cur)
+                cur.close()
+                return jsonify({'success': True, 'tables': tables})
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/get_user_tables')
+def get_user_tables():
+    """Get tables assigned to the logged-in user"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    try:
+        tables = [table_name for table_name, grant in get_user_permissions(username).items()
+                  if grant['can_write']]
+        return jsonify({'success': True, 'tables': tables})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@app.route('/get_table_columns/<table_name>')
+def get_table_columns(table_name):
+    """Get columns for a specific table"""
+    try:
+        definition = get_form_definition(table_name)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    response = jsonify({
+        'success': True,
+        'columns': definition['columns'],
+        'dropdownOptions': definition['dropdownOptions']
+    })
+    # Let the dashboard revalidate with If-None-Match instead of re-downloading
+    response.set_etag(definition['etag'])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/submit_form_data', methods=['POST'])
+def submit_form_data():
+    data = request.json
+    table_name = data.get('tableName')
+    form_data = data.get('formData', {})
+
+    # Check if user has permission to write to this table
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                # Check user permissions
+                if not has_table_permission(username, table_name, 'can_write', cur):
+                    return jsonify({'success': False, 'message': 'You do not have permission to submit data to this table'})
+
+                # Get column information (excluding system columns)
+                columns = [(col['name'], col['type'])
+                           for col in get_form_columns(cur, table_name)]
+
+                # Prepare insert query
+                column_names = [col[0] for col in columns]
+                column_names.append('submitted_by')
+                placeholders = ['%s'] * len(column_names)
+                values = []
+
+                # Convert values based on data type
+                for col_name, data_type in columns:
+                    value = form_data.get(col_name, '')
+                    if 'int' in data_type and value:
+                        try:
+                            values.append(int(value))
+                        except:
+                            values.append(0)
+                    elif 'bool' in data_type:
+                        values.append(bool(value))
+                    else:
+                        # Handle Amharic text by ensuring proper encoding
+                        values.append(str(value))
+
+                # Add submitted_by value
+                values.append(username)
+
+                insert_query = f'''
+                    INSERT INTO "{table_name}" ({', '.join([f'"{col}"' for col in column_names])})
+                    VALUES ({', '.join(placeholders)})
+                '''
+
+                cur.execute(insert_query, values)
+                conn.commit()
+                cur.close()
+
+                return jsonify({'success': True, 'message': 'Form data submitted successfully!'})
+
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+# Bulk submission
+# Offline field offices upload many rows at once, as a JSON array or a CSV
+# file. Every row is checked against the cached column types first, and
+# the valid rows go in with one multi-row INSERT in a single transaction
+BULK_SUBMIT_MAX_ROWS = int(os.environ.get('BULK_SUBMIT_MAX_ROWS', 5000))
+# Rows per INSERT statement sent by execute_values
+BULK_SUBMIT_PAGE_SIZE = 500
+
+INTEGER_RANGES = {
+    'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'integer': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+}
+BOOLEAN_VALUES = {
+    'true': True, 't': True, 'yes': True, 'y': True, 'on': True, '1': True,
+    'false': False, 'f': False, 'no': False, 'n': False, 'off': False, '0': False,
+}
+
+
+def _coerce_value(value, column):
+    """Convert a submitted value to ``column``'s type, raising ValueError if it doesn't fit.
+
+    Blank values become NULL, except for text columns, which store them
+    as empty strings like /submit_form_data does.
+    """
+    data_type = column['type']
+    if isinstance(value, str):
+        if data_type not in ('text', 'character varying', 'character'):
+            value = value.strip()
+        if value == '':
+            value = None
+    if value is None:
+        return '' if data_type in ('text', 'character varying', 'character') else None
+
+    if data_type in INTEGER_RANGES:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(f'expected a whole number, got {value!r}')
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'expected a whole number, got {value!r}')
+        low, high = INTEGER_RANGES[data_type]
+        if not low <= number <= high:
+            raise ValueError(f'{number} is out of range for {data_type}')
+        return number
+
+    if data_type == 'boolean':
+        if isinstance(value, bool):
+            return value
+        flag = BOOLEAN_VALUES.get(str(value).strip().lower())
+        if flag is None:
+            raise ValueError(f'expected true or false, got {value!r}')
+        return flag
+
+    if data_type in ('numeric', 'real', 'double precision'):
+        if isinstance(value, bool):
+            raise ValueError(f'expected a number, got {value!r}')
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f'expected a number, got {value!r}')
+        if not number.is_finite():
+            raise ValueError(f'expected a finite number, got {value!r}')
+        if column.get('precision') is not None:
+            scale = column.get('scale') or 0
+            try:
+                number = number.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+            except InvalidOperation:
+                number = None
+            if number is None or number.adjusted() >= column['precision'] - scale:
+                raise ValueError(
+                    f'{value} does not fit numeric({column["precision"]},{scale})')
+        return number
+
+    if data_type == 'date':
+        try:
+            return date.fromisoformat(str(value))
+        except ValueError:
+            raise ValueError(f'expected a date as YYYY-MM-DD, got {value!r}')
+
+    if data_type.startswith('timestamp'):
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            raise ValueError(f'expected an ISO 8601 timestamp, got {value!r}')
+
+    if isinstance(value, (dict, list)):
+        raise ValueError('expected a single value')
+    value = str(value)
+    if column.get('max_length') and len(value) > column['max_length']:
+        raise ValueError(
+            f'{len(value)} characters is longer than the limit of {column["max_length"]}')
+    return value
+
+
+def read_bulk_rows():
+    """Return ``(table_name, rows, skip_invalid)`` of a bulk submission.
+
+    JSON bodies carry ``tableName``, ``rows`` (a list of objects keyed by
+    column name) and an optional ``skipInvalid``, or are the list of rows
+    itself, with ``tableName`` and ``skipInvalid`` in the query string.
+    Multipart uploads carry the same fields as form fields plus a CSV
+    ``file`` whose header row names the columns. At most one row past
+    BULK_SUBMIT_MAX_ROWS is read, so the caller can reject the rest unread.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, list):
+            data = {'rows': data, 'tableName': request.args.get('tableName'),
+                    'skipInvalid': is_true(request.args.get('skipInvalid'))}
+        elif not isinstance(data, dict):
+            raise ValueError('Send a JSON object or a JSON array of rows')
+        rows = data.get('rows')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('rows must be a list of objects')
+        return data.get('tableName'), rows, bool(data.get('skipInvalid'))
+
+    upload = request.files.get('file')
+    if upload is None:
+        raise ValueError('Send JSON rows or a CSV file')
+    # utf-8-sig drops the byte order mark Excel puts in front of UTF-8 CSV
+    text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        rows = list(islice(csv.DictReader(text), BULK_SUBMIT_MAX_ROWS + 1))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f'Could not read CSV file: {e}')
+    return request.form.get('tableName'), rows, is_true(request.form.get('skipInvalid'))
+
+
+def is_true(value):
+    """Whether a form or query string flag is set"""
+    return (value or '').lower() in ('1', 'true', 'yes', 'on')
+
+
+@app.route('/submit_form_data_bulk', methods=['POST'])
+def submit_form_data_bulk():
+    """Insert many rows into a form table in one transaction.
+
+    Rows that fail validation are reported as ``errors`` (with the 1-based
+    ``row`` number, ``column`` and ``message``). By default nothing is
+    inserted if any row is invalid; with ``skipInvalid`` the valid rows
+    are inserted and the invalid ones skipped.
+    """
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    try:
+        table_name, rows, skip_invalid = read_bulk_rows()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    if not table_name:
+        return jsonify({'success': False, 'message': 'Table name required'})
+    if not rows:
+        return jsonify({'success': False, 'message': 'No rows to submit'})
+    if len(rows) > BULK_SUBMIT_MAX_ROWS:
+        return jsonify({'success': False,
+                        'message': f'At most {BULK_SUBMIT_MAX_ROWS} rows can be submitted at once'})
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                if not has_table_permission(username, table_name, 'can_write', cur):
+                    return jsonify({'success': False, 'message': 'You do not have permission to submit data to this table'})
+
+                columns = get_form_columns(cur, table_name)
+                column_names = {col['name'] for col in columns}
+                unknown = sorted({key for row in rows for key in row
+                                  if key is not None and key not in column_names})
+                if unknown:
+                    return jsonify({'success': False,
+                                    'message': f"Unknown columns: {', '.join(unknown)}"})
+
+                values = []
+                errors = []
+                for number, row in enumerate(rows, start=1):
+                    record = []
+                    row_errors = []
+                    for col in columns:
+                        try:
+                            record.append(_coerce_value(row.get(col['name']), col))
+                        except ValueError as e:
+                            row_errors.append({'row': number, 'column': col['name'],
+                                               'message': str(e)})
+                    errors.extend(row_errors)
+                    if not row_errors:
+                        record.append(username)
+                        values.append(record)
+
+                invalid = len(rows) - len(values)
+                if invalid and not skip_invalid:
+                    return jsonify({'success': False,
+                                    'message': f'{invalid} of {len(rows)} rows failed validation; nothing was submitted',
+                                    'errors': errors})
+
+                if values:
+                    insert_query = sql.SQL('INSERT INTO {} ({}) VALUES %s').format(
+                        sql.Identifier(table_name),
+                        sql.SQL(', ').join(sql.Identifier(name) for name in
+                                           [col['name'] for col in columns] + ['submitted_by']))
+                    execute_values(cur, insert_query.as_string(cur), values,
+                                   page_size=BULK_SUBMIT_PAGE_SIZE)
+                conn.commit()
+                cur.close()
+
+                message = f'{len(values)} rows submitted successfully!'
+                if invalid:
+                    message += f' {invalid} invalid rows were skipped.'
+                return jsonify({'success': True, 'message': message,
+                                'inserted': len(values), 'errors': errors})
+
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/get_user_summary')
+def get_user_summary():
+    """Per-table counts of the user's submissions, read from submission_stats"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                tables = get_user_table_stats(cur, username)
+                cur.close()
+
+                for table in tables:
+                    if table['last_submission']:
+                        table['last_submission'] = table['last_submission'].isoformat()
+
+                return jsonify({
+                    'success': True,
+                    'tables': tables,
+                    'total_records': sum(table['total'] for table in tables),
+                    'today': sum(table['today'] for table in tables),
+                })
+
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+def cached_admin_overview():
+    """The admin overview, recomputed when older than ADMIN_OVERVIEW_MAX_AGE"""
+    global _admin_overview, _admin_overview_at
+    # One request recomputes; the others wait for its answer
+    with _admin_overview_lock:
+        age = time.monotonic() - _admin_overview_at
+        if _admin_overview is not None and age < ADMIN_OVERVIEW_MAX_AGE:
+            return _admin_overview
+
+        with db_connection() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cur = conn.cursor()
+            overview = get_admin_overview(cur, ADMIN_OVERVIEW_DAYS)
+            cur.close()
+
+        for table in overview['tables']:
+            if table['last_submission']:
+                table['last_submission'] = table['last_submission'].isoformat()
+        for day in overview['daily']:
+            day['day'] = day['day'].isoformat()
+        tables = overview['tables']
+        overview.update({
+            'days': ADMIN_OVERVIEW_DAYS,
+            'total_records': sum(table['total'] for table in tables),
+            'today': sum(table['today'] for table in tables),
+            'last_7_days': sum(table['last_7_days'] for table in tables),
+            'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        })
+        _admin_overview, _admin_overview_at = overview, time.monotonic()
+        return overview
+
+
+@app.route('/admin_overview')
+def admin_overview():
+    """City-wide submission counts per table and day, read from submission_stats"""
+    try:
+        overview = cached_admin_overview()
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, **overview})
+
+
+# Keyset pagination
+# Cursors are opaque to clients: the sort key of the last row returned,
+# JSON-encoded and base64'd, so the next page starts right after it
+SUBMISSIONS_PAGE_SIZE = 50
+SUBMISSIONS_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Encode a list of sort-key values (datetimes allowed) as a page cursor"""
+    values = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; datetimes come back as ISO strings. Raises ValueError."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def get_page_size(default, maximum):
+    """Read the ``limit`` query parameter, clamped to 1..maximum"""
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+@app.route('/get_user_submissions')
+def get_user_submissions():
+    """Newest-first page of the user's submissions across all their tables.
+
+    Query parameters: ``limit`` (page size) and ``cursor`` (the
+    ``next_cursor`` of the previous page).
+    """
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    limit = get_page_size(SUBMISSIONS_PAGE_SIZE, SUBMISSIONS_MAX_PAGE_SIZE)
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after_at, after_table, after_id = decode_cursor(request.args['cursor'])
+            after = (datetime.fromisoformat(after_at), after_table, int(after_id))
+        except (ValueError, TypeError):
+            return jsonify({'success': False, 'message': 'Invalid cursor'})
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                # Get tables user has permission to access
+                user_tables = [table_name for table_name in get_user_permissions(username, cur)
+                               if get_table_schema(cur, table_name)]
+
+                if not user_tables:
+                    cur.close()
+                    return jsonify({'success': True, 'submissions': [], 'next_cursor': None})
+
+                # Rows are ordered by (created_at, table, id) descending. Each
+                # table contributes at most one page of rows after the cursor,
+                # so the work per page doesn't grow with submission history.
+                # Table names sort bytewise (COLLATE "C") to agree with the
+                # Python comparisons below, whatever the database collation.
+                subqueries = []
+                params = []
+                for table in user_tables:
+                    condition, condition_params = sql.SQL(''), []
+                    if after:
+                        after_at, after_table, after_id = after
+                        if table == after_table:
+                            condition = sql.SQL(' AND (created_at, id) < (%s, %s)')
+                            condition_params = [after_at, after_id]
+                        elif table < after_table:
+                            condition = sql.SQL(' AND created_at <= %s')
+                            condition_params = [after_at]
+                        else:
+                            condition = sql.SQL(' AND created_at < %s')
+                            condition_params = [after_at]
+
+                    subqueries.append(sql.SQL(
+                        "(SELECT {label} COLLATE \"C\" AS table_name, id, created_at FROM {table} "
+                        "WHERE submitted_by = %s{condition} "
+                        "ORDER BY created_at DESC, id DESC LIMIT %s)"
+                    ).format(label=sql.Literal(table), table=sql.Identifier(table),
+                             condition=condition))
+                    params.extend([username, *condition_params, limit + 1])
+
+                query = sql.SQL(' UNION ALL ').join(subqueries) + sql.SQL(
+                    ' ORDER BY created_at DESC, table_name DESC, id DESC LIMIT %s')
+                cur.execute(query, params + [limit + 1])
+                rows = cur.fetchall()
+                cur.close()
+
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    last_table, last_id, last_at = rows[-1]
+                    next_cursor = encode_cursor([last_at, last_table, last_id])
+
+                submissions = [{
+                    'table': table,
+                    'record_id': record_id,
+                    'submitted_at': created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else None
+                } for table, record_id, created_at in rows]
+
+                return jsonify({'success': True, 'submissions': submissions,
+                                'next_cursor': next_cursor})
+
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+# Record browser
+# Pages through any dynamic table. Every identifier in the query comes from
+# the cached schema and every value is a bound parameter, converted to the
+# column's type first
+BROWSE_PAGE_SIZE = 50
+BROWSE_MAX_PAGE_SIZE = 500
+BROWSE_MAX_FILTERS = 10
+
+# Sortable columns and the keyset each sorts by (all covered by an index)
+BROWSE_SORT_KEYS = {
+    'created_at': ('created_at', 'id'),
+    'id': ('id',),
+}
+BROWSE_FILTER_OPERATORS = {
+    'eq': '=', 'ne': '<>', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>=',
+    'contains': 'ILIKE', 'null': 'IS NULL', 'notnull': 'IS NOT NULL',
+}
+
+
+def parse_browse_filter(spec, schema):
+    """Turn a ``column:operator[:value]`` filter into a SQL condition and its parameters"""
+    parts = spec.split(':', 2)
+    if len(parts) < 2:
+        raise ValueError(f'Filter must look like column:operator:value, got {spec!r}')
+    column_name, operator = parts[0], parts[1]
+    value = parts[2] if len(parts) == 3 else ''
+
+    column = schema.get(column_name)
+    if column is None:
+        raise ValueError(f'Unknown column: {column_name}')
+    if operator not in BROWSE_FILTER_OPERATORS:
+        raise ValueError(f"Unknown filter operator {operator!r}; use one of "
+                         f"{', '.join(BROWSE_FILTER_OPERATORS)}")
+
+    identifier = sql.Identifier(column_name)
+    sql_operator = sql.SQL(BROWSE_FILTER_OPERATORS[operator])
+    if operator in ('null', 'notnull'):
+        return sql.SQL('{} {}').format(identifier, sql_operator), []
+    if operator == 'contains':
+        # Match the text form of the column, with the value's LIKE wildcards escaped
+        pattern = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return (sql.SQL('{}::text {} %s').format(identifier, sql_operator),
+                [f'%{pattern}%'])
+
+    try:
+        converted = _coerce_value(value, column)
+    except ValueError as e:
+        raise ValueError(f'{column_name}: {e}')
+    if converted is None:
+        raise ValueError(f'{column_name}: a value is required; use {column_name}:null to match NULL')
+    return sql.SQL('{} {} %s').format(identifier, sql_operator), [converted]
+
+
+def browse_json_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+@app.route('/browse_table/<table_name>')
+def browse_table(table_name):
+    """One page of a dynamic table's rows, for users who can read it.
+
+    Query parameters:
+
+    - ``columns``: comma-separated projection (default: all columns)
+    - ``filter``: ``column:operator:value``, repeatable and ANDed together;
+      operators are eq, ne, lt, lte, gt, gte, contains (case-insensitive
+      substring), null and notnull (no value)
+    - ``sort``: ``created_at`` (default) or ``id``; ``order``: desc (default) or asc
+    - ``limit`` and ``cursor`` (the ``next_cursor`` of the previous page)
+    """
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc').lower()
+    if sort not in BROWSE_SORT_KEYS:
+        return jsonify({'success': False,
+                        'message': f"Can only sort by {', '.join(BROWSE_SORT_KEYS)}"})
+    if order not in ('asc', 'desc'):
+        return jsonify({'success': False, 'message': 'Order must be asc or desc'})
+    filters = request.args.getlist('filter')
+    if len(filters) > BROWSE_MAX_FILTERS:
+        return jsonify({'success': False,
+                        'message': f'At most {BROWSE_MAX_FILTERS} filters are allowed'})
+    limit = get_page_size(BROWSE_PAGE_SIZE, BROWSE_MAX_PAGE_SIZE)
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                if (table_name in SYSTEM_TABLES
+                        or not has_table_permission(username, table_name, 'can_read', cur)):
+                    return jsonify({'success': False, 'message': 'You do not have permission to read this table'})
+
+                schema = {col['name']: col for col in get_table_schema(cur, table_name)}
+                if not schema:
+                    return jsonify({'success': False, 'message': 'Table not found'})
+
+                if request.args.get('columns'):
+                    columns = [name.strip() for name in request.args['columns'].split(',')
+                               if name.strip()]
+                    unknown = [name for name in columns if name not in schema]
+                    if unknown:
+                        return jsonify({'success': False,
+                                        'message': f"Unknown columns: {', '.join(unknown)}"})
+                else:
+                    columns = list(schema)
+
+                conditions, params = [], []
+                for spec in filters:
+                    condition, condition_params = parse_browse_filter(spec, schema)
+                    conditions.append(condition)
+                    params.extend(condition_params)
+
+                keys = BROWSE_SORT_KEYS[sort]
+                if request.args.get('cursor'):
+                    after = decode_cursor(request.args['cursor'])
+                    if len(after) != len(keys):
+                        raise ValueError('Invalid cursor')
+                    try:
+                        after = [_coerce_value(value, schema[key])
+                                 for key, value in zip(keys, after)]
+                    except ValueError:
+                        raise ValueError('Invalid cursor')
+                    conditions.append(sql.SQL('({}) {} ({})').format(
+                        sql.SQL(', ').join(map(sql.Identifier, keys)),
+                        sql.SQL('<' if order == 'desc' else '>'),
+                        sql.SQL(', ').join(sql.Placeholder() * len(keys))))
+                    params.extend(after)
+
+                direction = sql.SQL('DESC' if order == 'desc' else 'ASC')
+                query = sql.SQL('SELECT {} FROM {}{} ORDER BY {} LIMIT %s').format(
+                    sql.SQL(', ').join(map(sql.Identifier, columns + list(keys))),
+                    sql.Identifier(table_name),
+                    sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions)
+                    if conditions else sql.SQL(''),
+                    sql.SQL(', ').join(sql.SQL('{} {}').format(sql.Identifier(key), direction)
+                                       for key in keys))
+                cur.execute(query, params + [limit + 1])
+                rows = cur.fetchall()
+                cur.close()
+
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = encode_cursor(list(rows[-1][len(columns):]))
+
+                return jsonify({
+                    'success': True,
+                    'columns': columns,
+                    'rows': [{name: browse_json_value(value)
+                              for name, value in zip(columns, row)} for row in rows],
+                    'next_cursor': next_cursor,
+                })
+
+            except Exception as e:
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+@app.route('/assign_table_to_user', methods=['POST'])
+def assign_table_to_user():
+    """Assign a table to a user"""
+    data = request.json
+    username = data.get('username')
+    table_name = data.get('tableName')
+
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                cur.execute('''
+                    INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (username, table_name) 
+                    DO UPDATE SET can_write = EXCLUDED.can_write
+                ''', (username, table_name, True, True))
+                publish_invalidation(cur, 'permissions', username)
+
+                conn.commit()
+                cur.close()
+                invalidate_user_permissions(username)
+
+                return jsonify({'success': True, 'message': f'Table {table_name} assigned to user {username} successfully!'})
+
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+
+def has_metrics_access():
+    """Whether the request carries METRICS_TOKEN (as a bearer token) or PROFILE_TOKEN"""
+    if METRICS_TOKEN and hmac.compare_digest(
+            request.headers.get('Authorization', '').encode('utf-8'),
+            f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+        return True
+    return has_profile_token(request.headers.get('X-Profile'))
+
+
+@app.route('/db_pool_stats')
+def db_pool_stats():
+    """Connection pool counters for this worker (checkouts, waits, timeouts)"""
+    if not has_metrics_access():
+        return jsonify({'success': False, 'message': 'Metrics token required'}), 401
+    return jsonify({'success': True, 'pid': os.getpid(), 'pool': get_db_pool().snapshot()})
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None or not METRICS_ENABLED:
+        return response
+    method = request.method
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    status = str(response.status_code)
+
+    # Streamed exports and PDFs are only done once the body has been sent
+    def record():
+        HTTP_REQUESTS.inc(method, route, status)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, route)
+
+    response.call_on_close(record)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """All workers' metrics in the Prometheus text format"""
+    if not METRICS_ENABLED:
+        return Response('Metrics are disabled\n', status=404, mimetype='text/plain')
+    if not has_metrics_access():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(render_metrics(collect_metrics()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Request profiling
+# A request is profiled when it carries PROFILE_TOKEN in the X-Profile header
+# (only there: a query parameter would end up in the access log), or when it
+# is picked at random at PROFILE_SAMPLE_RATE. Requested profiles use cProfile (exact, but it can
+# slow CPU-heavy requests several times over) unless X-Profile-Mode asks for
+# "sampling"; random picks always use the stack sampler, whose cost doesn't
+# depend on the request. The profile and the SQL the request ran are saved
+# in PROFILE_DIR and listed by /admin_profiles (which also wants the token).
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+PROFILE_MAX_KEPT = int(os.environ.get('PROFILE_MAX_KEPT', 200))
+# Seconds between stack samples, and the longest a sampler runs
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+PROFILE_SAMPLER_MAX_SECONDS = 900
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+
+def new_profile_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(4)}"
+
+
+def has_profile_token(value):
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(
+        (value or '').encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+
+class StackSampler:
+    """Records one thread's Python stack every PROFILE_SAMPLE_INTERVAL seconds"""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.samples = Counter()  # "outer;...;inner" -> times seen
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + PROFILE_SAMPLER_MAX_SECONDS
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def top_functions(self, duration):
+        """Most sampled functions, with times estimated as their share of ``duration``"""
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            for function in set(frames):
+                inclusive[function] += count
+            own[frames[-1]] += count
+        # Samples come late when the GIL is busy, so scale rather than
+        # multiply by the nominal interval
+        seconds_per_sample = duration / max(1, sum(self.samples.values()))
+        return [{
+            'function': function,
+            'samples': count,
+            'own_seconds': own[function] * seconds_per_sample,
+            'cumulative_seconds': count * seconds_per_sample,
+        } for function, count in inclusive.most_common(PROFILE_TOP_FUNCTIONS)]
+
+    def dump(self, path):
+        """Write the samples in the collapsed-stack format flame graph tools read"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+@app.before_request
+def start_request_profile():
+    if not (PROFILE_TOKEN or PROFILE_SAMPLE_RATE):
+        return
+    # In case an earlier profile of this thread wasn't finished
+    _profile_local.__dict__.pop('statements', None)
+    if has_profile_token(request.headers.get('X-Profile')):
+        reason = 'requested'
+        sampling = request.headers.get('X-Profile-Mode') == 'sampling'
+    elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        reason, sampling = 'sampled', True
+    else:
+        return
+
+    if sampling:
+        profiler = StackSampler(threading.get_ident())
+    else:
+        profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another cProfile (another request's, on 3.12+) is already running
+        return
+    _profile_local.statements = []
+    g.profile = {
+        'id': new_profile_id(),
+        'reason': reason,
+        'mode': 'sampling' if sampling else 'cprofile',
+        'profiler': profiler,
+        'statements': _profile_local.statements,
+        'started': time.perf_counter(),
+    }
+
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.update({
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'route': request.url_rule.rule if request.url_rule else None,
+        'username': session.get('username'),
+        'status': response.status_code,
+    })
+    response.headers['X-Profile-Id'] = profile['id']
+
+    # Streamed bodies are produced after this hook, so stop at close
+    def finish():
+        profile['profiler'].disable()
+        if getattr(_profile_local, 'statements', None) is profile['statements']:
+            del _profile_local.statements
+        try:
+            save_profile(profile, time.perf_counter() - profile['started'])
+        except Exception as e:
+            logger.error(f"Could not save profile {profile['id']}: {e}")
+
+    response.call_on_close(finish)
+    return response
+
+
+def save_profile(profile, duration):
+    profiler = profile.pop('profiler')
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base_path = os.path.join(PROFILE_DIR, profile['id'])
+    if isinstance(profiler, StackSampler):
+        top_functions = profiler.top_functions(duration)
+        profiler.dump(base_path + '.folded')
+    else:
+        stats = pstats.Stats(profiler)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        top_functions = [{
+            'function': f'{name} ({filename}:{line})',
+            'calls': calls,
+            'own_seconds': own,
+            'cumulative_seconds': cumulative,
+        } for (filename, line, name), (_, calls, own, cumulative, _) in
+            functions[:PROFILE_TOP_FUNCTIONS]]
+        stats.dump_stats(base_path + '.prof')
+
+    statements = profile.pop('statements')
+    profile.pop('started')
+    profile.update({
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'duration_seconds': duration,
+        'sql_seconds': sum(statement['seconds'] for statement in statements),
+        'sql_count': len(statements),
+        'top_functions': top_functions,
+        'statements': statements,
+    })
+    with open(base_path + '.json', 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=1)
+    logger.info(f"Saved profile {profile['id']} of {profile['path']}: {duration:.3f}s, "
+                f"{len(statements)} statements")
+
+    saved = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+    for profile_id in saved[:-PROFILE_MAX_KEPT]:
+        for extension in ('.json', '.prof', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(profile_id, extension):
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + extension)
+    return path if os.path.exists(path) else None
+
+
+def profile_access_denied():
+    """401 response unless the request carries PROFILE_TOKEN"""
+    if not has_profile_token(request.headers.get('X-Profile')):
+        response = jsonify({'success': False, 'message': 'Profile token required'})
+        response.status_code = 401
+        return response
+    return None
+
+
+@app.route('/admin_profiles')
+def admin_profiles():
+    """Saved request profiles, newest first (without their details)"""
+    denied = profile_access_denied()
+    if denied:
+        return denied
+    profiles = []
+    if os.path.isdir(PROFILE_DIR):
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(PROFILE_DIR, name), encoding='utf-8') as f:
+                profile = json.load(f)
+            profile.pop('top_functions', None)
+            profile.pop('statements', None)
+            profiles.append(profile)
+    return jsonify({'success': True, 'profiles': profiles})
+
+
+@app.route('/admin_profile/<profile_id>')
+def admin_profile(profile_id):
+    """One saved profile: top functions and every SQL statement with its time"""
+    denied = profile_access_denied()
+    if denied:
+        return denied
+    path = profile_path(profile_id, '.json')
+    if path is None:
+        return jsonify({'success': False, 'message': 'Profile not found'}), 404
+    with open(path, encoding='utf-8') as f:
+        return jsonify({'success': True, 'profile': json.load(f)})
+
+
+@app.route('/download_profile/<profile_id>')
+def download_profile(profile_id):
+    """The raw profile: cProfile stats (.prof) or collapsed stacks (.folded)"""
+    denied = profile_access_denied()
+    if denied:
+        return denied
+    for extension in ('.prof', '.folded'):
+        path = profile_path(profile_id, extension)
+        if path is not None:
+            return Response(stream_file(open(path, 'rb')), mimetype='application/octet-stream',
+                            headers=attachment_headers(f'{profile_id}{extension}'))
+    return jsonify({'success': False, 'message': 'Profile not found'}), 404
 
 
 def safe_string(value):
@@ -610,192 +3370,670 @@ def safe_string(value):
         return ""
 
 
-def create_paragraph_with_font(text, font_size=12, alignment=0, bold=False):
-    """Create paragraph with Amharic font support"""
-    styles = getSampleStyleSheet()
+@lru_cache(maxsize=None)
+def get_paragraph_style(font_size, alignment, bold, amharic):
+    """Shared ParagraphStyle for one combination of size, alignment and font"""
+    if amharic:
+        font_name = 'Amharic'
+    else:
+        font_name = 'Helvetica-Bold' if bold else 'Helvetica'
+
+    return ParagraphStyle(
+        f'CustomStyle-{font_name}-{font_size}-{alignment}',
+        parent=getSampleStyleSheet()['Normal'],
+        fontSize=font_size,
+        alignment=alignment,
+        fontName=font_name
+    )
+
+
+def create_paragraph_with_font(text, font_size=12, alignment=0, bold=False):
+    """Create paragraph with Amharic font support"""
+    style = get_paragraph_style(font_size, alignment, bold, amharic_font_available)
+    return Paragraph(str(text), style)
+
+
+@lru_cache(maxsize=None)
+def get_table_style(font_name):
+    """Shared TableStyle for the data tables of the PDF reports"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ])
+
+
+def create_table_with_font_support(data, col_widths=None):
+    """Create a table with proper font support"""
+    if not data or len(data) == 0:
+        return None
+
+    try:
+        table = Table(data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(get_table_style(
+            'Amharic' if amharic_font_available else 'Helvetica'))
+        return table
+    except Exception as e:
+        logger.error(f"Error creating table: {e}")
+        return None
+
+
+# Streaming PDF export
+# Rows are read through a server-side cursor and laid out as page-sized
+# tables as they arrive, and the PDF is written to a temp file that spills
+# to disk, so memory stays flat no matter how many rows a table holds
+EXPORT_FETCH_SIZE = int(os.environ.get('EXPORT_FETCH_SIZE', 2000))
+# Data rows per Table flowable, about one A4 page at font size 8
+EXPORT_ROWS_PER_TABLE = int(os.environ.get('EXPORT_ROWS_PER_TABLE', 40))
+# Rendered reports larger than this are spooled to disk instead of memory
+EXPORT_SPOOL_MAX_MEMORY = int(os.environ.get('EXPORT_SPOOL_MAX_MEMORY', 8 * 1024 * 1024))
+
+
+class StreamingDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate that lays out flowables as an iterable produces them.
+
+    ``build`` needs the whole story as a list up front; ``build_from`` pulls
+    one flowable at a time, so only what is on the current page stays alive.
+    """
+
+    def build_from(self, flowables):
+        self._calc()
+        frame = Frame(self.leftMargin, self.bottomMargin,
+                      self.width, self.height, id='normal')
+        self.addPageTemplates([
+            PageTemplate(id='First', frames=frame, pagesize=self.pagesize),
+            PageTemplate(id='Later', frames=frame, pagesize=self.pagesize),
+        ])
+        self._startBuild()
+        canv = self.canv
+        canv._doctemplate = self
+        try:
+            pending = []
+            for flowable in flowables:
+                pending.append(flowable)
+                # A flowable that doesn't fit is split back onto the list
+                while pending:
+                    self.clean_hanging()
+                    self.handle_flowable(pending)
+        finally:
+            del canv._doctemplate
+        self._endBuild()
+
+
+def format_cell(cell):
+    """Format a database value for a PDF table cell"""
+    if cell is None:
+        return ""
+    if isinstance(cell, (datetime, date)):
+        return cell.strftime('%Y-%m-%d %H:%M:%S')
+    return safe_string(cell)
+
+
+def iter_table_records(conn, table_name, username):
+    """Yield the user's rows of ``table_name``, newest first, in fetch-sized batches"""
+    cur = conn.cursor(name='export_rows')
+    try:
+        cur.execute(sql.SQL(
+            'SELECT * FROM {} WHERE submitted_by = %s ORDER BY created_at DESC, id DESC'
+        ).format(sql.Identifier(table_name)), (username,))
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
+def iter_table_flowables(conn, table_name, username):
+    """Yield page-sized Table flowables of the user's rows of ``table_name``.
+
+    Returns the number of rows rendered (use ``yield from`` to get it).
+    """
+    cur = conn.cursor()
+    columns = [safe_string(col['name'])
+               for col in get_table_schema(cur, table_name)]
+    cur.close()
+
+    count = 0
+    chunk = []
+    for record in iter_table_records(conn, table_name, username):
+        chunk.append([format_cell(cell) for cell in record])
+        count += 1
+        if len(chunk) == EXPORT_ROWS_PER_TABLE:
+            yield create_table_with_font_support([columns] + chunk)
+            chunk = []
+    if chunk:
+        yield create_table_with_font_support([columns] + chunk)
+    return count
+
+
+# Parallel export
+# The per-user report fans its tables out over a pool of processes, each
+# with its own connection pool and registered fonts. Workers fetch, format
+# and measure a table's rows into a temp file of page-sized chunks; the
+# parent reads it back a page at a time, lays out and draws the pages
+EXPORT_PARALLEL_WORKERS = int(os.environ.get('EXPORT_PARALLEL_WORKERS', min(4, os.cpu_count() or 1)))
+# Cell padding a Table adds to each column (LEFTPADDING + RIGHTPADDING)
+TABLE_CELL_PADDING = 12
+
+_export_executor = None
+_export_executor_pid = None
+_export_executor_lock = threading.Lock()
+
+
+def parallel_export_enabled(table_count):
+    # Report job workers are already spread over processes, so they
+    # render serially rather than spawning a pool of their own
+    return (EXPORT_PARALLEL_WORKERS > 1 and table_count > 1
+            and multiprocessing.parent_process() is None)
+
+
+def get_export_executor():
+    """This process's pool of table export processes"""
+    global _export_executor, _export_executor_pid
+    pid = os.getpid()
+    if _export_executor is None or _export_executor_pid != pid:
+        with _export_executor_lock:
+            if _export_executor is None or _export_executor_pid != pid:
+                _export_executor = ProcessPoolExecutor(
+                    max_workers=EXPORT_PARALLEL_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_helper_process)
+                _export_executor_pid = pid
+    return _export_executor
+
+
+def measure_column_widths(columns, rows, widths=None):
+    """Natural column widths of a table, as Table would compute them.
+
+    Passing these as ``colWidths`` saves the parent from measuring every
+    cell again, and keeps the columns the same width on every page. Pass
+    the ``widths`` of earlier rows to measure a table batch by batch.
+    """
+    font_name = 'Amharic' if amharic_font_available else 'Helvetica'
+    measured = []
+    for index, column in enumerate(columns):
+        seen = {}
+        width = max(pdfmetrics.stringWidth(line, font_name, 9)
+                    for line in column.split('\n')) + TABLE_CELL_PADDING
+        if widths:
+            width = max(width, widths[index])
+        for row in rows:
+            value = row[index]
+            if value not in seen:
+                seen[value] = max(pdfmetrics.stringWidth(line, font_name, 8)
+                                  for line in value.split('\n'))
+                width = max(width, seen[value] + TABLE_CELL_PADDING)
+        measured.append(width)
+    return measured
+
+
+def prepare_table_section(username, table_name):
+    """Fetch, format and measure the user's rows of one table (runs in an export process).
+
+    The rows go to a temp file as pickled page-sized chunks, so neither
+    this process nor the parent holds more than a fetch batch of them.
+    Returns ``(columns, path, count, col_widths)``; the caller reads the
+    chunks with read_section_pages and removes the file.
+    """
+    fd, path = tempfile.mkstemp(prefix='export-section-', suffix='.pickle')
+    try:
+        with os.fdopen(fd, 'wb') as fp, db_connection() as conn:
+            if not conn:
+                raise RuntimeError("Database connection failed")
+            cur = conn.cursor()
+            columns = [safe_string(col['name'])
+                       for col in get_table_schema(cur, table_name)]
+            cur.close()
+
+            count = 0
+            col_widths = None
+            chunk = []
+            for record in iter_table_records(conn, table_name, username):
+                chunk.append([format_cell(cell) for cell in record])
+                count += 1
+                if len(chunk) == EXPORT_ROWS_PER_TABLE:
+                    col_widths = measure_column_widths(columns, chunk, col_widths)
+                    pickle.dump(chunk, fp, pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+            if chunk or col_widths is None:
+                col_widths = measure_column_widths(columns, chunk, col_widths)
+            if chunk:
+                pickle.dump(chunk, fp, pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.remove(path)
+        raise
+    return columns, path, count, col_widths
+
+
+def read_section_pages(path):
+    """Yield the page-sized row chunks prepare_table_section wrote, then remove the file"""
+    try:
+        with open(path, 'rb') as fp:
+            while True:
+                try:
+                    yield pickle.load(fp)
+                except EOFError:
+                    return
+    finally:
+        os.remove(path)
+
+
+def discard_prepared_section(future):
+    """Remove the temp file of a prepared section nobody is going to read"""
+    if not future.cancelled() and future.exception() is None:
+        try:
+            os.remove(future.result()[1])
+        except FileNotFoundError:
+            pass
+
+
+def iter_prepared_sections(username, table_names):
+    """Yield ``(table_name, future)`` in table order while later tables are prepared.
+
+    At most one table per export process is prepared ahead of the one being
+    laid out, which bounds how many finished tables wait in memory.
+    """
+    executor = get_export_executor()
+    pending = deque()
+    try:
+        for table_name in table_names:
+            pending.append((table_name, executor.submit(
+                prepare_table_section, username, table_name)))
+            if len(pending) > EXPORT_PARALLEL_WORKERS:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        for _, future in pending:
+            if not future.cancel():
+                future.add_done_callback(discard_prepared_section)
+
+
+def build_pdf(fp, flowables, report_type='other'):
+    """Lay out a flowable iterable into an open binary file"""
+    started = time.perf_counter()
+    start_offset = fp.tell()
+    try:
+        StreamingDocTemplate(fp, pagesize=A4).build_from(flowables)
+    finally:
+        # Hands the generator's database connection back to the pool
+        if hasattr(flowables, 'close'):
+            flowables.close()
+    PDF_RENDER_DURATION.observe(time.perf_counter() - started, report_type)
+    PDF_RENDER_BYTES.observe(fp.tell() - start_offset, report_type)
+
+
+def render_pdf(flowables, report_type='other'):
+    """Render a flowable iterable into a spooled temp file, rewound for reading"""
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MEMORY)
+    try:
+        build_pdf(spool, flowables, report_type)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def attachment_headers(filename):
+    """Content-Disposition for a download, with a UTF-8 name for Amharic titles"""
+    ascii_name = filename.encode('ascii', 'replace').decode('ascii').replace('?', '_')
+    return {"Content-Disposition":
+            f"attachment;filename={ascii_name};filename*=UTF-8''{quote(filename)}"}
 
-    # Choose font family based on availability
-    if amharic_font_available:
-        font_name = 'Amharic'
-        print(f"🔤 Using Amharic font for: {text[:50]}...")
-    else:
-        font_name = 'Helvetica-Bold' if bold else 'Helvetica'
-        print(f"⚠️  Using fallback font for: {text[:50]}...")
 
-    style = ParagraphStyle(
-        'CustomStyle',
-        parent=styles['Normal'],
-        fontSize=font_size,
-        alignment=alignment,
-        fontName=font_name
-    )
-    return Paragraph(str(text), style)
+def stream_file(fp, chunk_size=64 * 1024):
+    """Yield a file's contents in chunks, closing it when done"""
+    try:
+        while True:
+            data = fp.read(chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        fp.close()
+
+
+def pdf_file_response(spool, filename):
+    spool.seek(0, os.SEEK_END)
+    file_size = spool.tell()
+    spool.seek(0)
+    headers = attachment_headers(filename)
+    headers['Content-Length'] = str(file_size)
+    return Response(stream_file(spool), mimetype="application/pdf", headers=headers), file_size
+
+
+# Rendered report cache
+# PDFs are kept on local disk under a key made of the report type, user,
+# table and the data versions of everything the report shows, so a report
+# is only re-rendered after the user's data (or table list) has changed.
+# The versions are bumped by the submission_stats triggers, so reports of
+# tables without them (created before migration 0003 and not yet through
+# backfill-stats) are rendered every time instead of cached.
+# Least recently used files are evicted once the cache outgrows its budget
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(app.instance_path, 'report_cache'))
+# 0 turns the cache off
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Bump when report layout changes so old renderings aren't served
+REPORT_CACHE_FORMAT = 2
+
+# Tables seen to have the triggers (they are never taken off again), and
+# tables already warned about
+_stats_trigger_tables = set()
+_untriggered_tables_warned = set()
+
+
+def tables_without_stats_triggers(cur, table_names):
+    """Those of ``table_names`` whose data versions aren't kept by the triggers"""
+    unknown = [table_name for table_name in table_names
+               if table_name not in _stats_trigger_tables]
+    if not unknown:
+        return []
+    cur.execute("""
+        SELECT t.table_name FROM unnest(%s::text[]) AS t(table_name)
+        WHERE (SELECT COUNT(*) FROM pg_trigger
+               WHERE tgrelid = to_regclass(quote_ident(t.table_name))
+                 AND tgname = ANY(%s)) = %s
+    """, (unknown, [name for name, _, _ in SUBMISSION_STATS_TRIGGERS],
+          len(SUBMISSION_STATS_TRIGGERS)))
+    _stats_trigger_tables.update(row[0] for row in cur.fetchall())
+    return [table_name for table_name in unknown if table_name not in _stats_trigger_tables]
+
+
+def get_data_versions(cur, username, table_names):
+    """``{table_name: version}`` of the user's rows in each table (0 if never written)"""
+    cur.execute("""
+        SELECT table_name, version FROM table_data_versions
+        WHERE submitted_by = %s AND table_name = ANY(%s)
+    """, (username, list(table_names)))
+    versions = dict(cur.fetchall())
+    return {table_name: versions.get(table_name, 0) for table_name in table_names}
+
+
+def report_cache_key(cur, report_type, username, table_name=None):
+    """Cache key (and ETag) of a report, given the current state of its data.
+
+    None if the report can't be cached because a table it shows has no
+    data versions. The grants are read past the permission cache, which
+    may lag a change by up to PERMISSION_CACHE_TTL, so a new or revoked
+    table always makes a new key.
+    """
+    if report_type == 'form':
+        tables = [table_name]
+    else:
+        tables = list(load_user_permissions(cur, username))
+    untriggered = tables_without_stats_triggers(cur, tables)
+    if untriggered:
+        for name in set(untriggered) - _untriggered_tables_warned:
+            logger.warning(f"Reports on {name} are not cached: it has no submission_stats "
+                           f"triggers. Run `flask --app app backfill-stats`")
+        _untriggered_tables_warned.update(untriggered)
+        return None
+    versions = get_data_versions(cur, username, tables)
+    payload = json.dumps([REPORT_CACHE_FORMAT, report_type, username, table_name,
+                          [[table, versions[table]] for table in tables]],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
 
-def create_table_with_font_support(data):
-    """Create a table with proper font support"""
-    if not data or len(data) == 0:
+def get_cached_report(key):
+    """Path of the cached rendering for ``key``, or None"""
+    path = os.path.join(REPORT_CACHE_DIR, f'{key}.pdf')
+    try:
+        # The mtime is the LRU clock
+        os.utime(path)
+    except FileNotFoundError:
         return None
+    return path
 
-    try:
-        table = Table(data, repeatRows=1)
 
-        # Choose font based on availability
-        if amharic_font_available:
-            font_name = 'Amharic'
-            print("🔤 Creating table with Amharic font")
-        else:
-            font_name = 'Helvetica'
-            print("⚠️  Creating table with fallback font")
-
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), font_name),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
-        return table
-    except Exception as e:
-        print(f"❌ Error creating table: {e}")
-        return None
+def evict_report_cache(keep=None):
+    """Delete least recently used reports until the cache fits REPORT_CACHE_MAX_BYTES"""
+    entries = []
+    with os.scandir(REPORT_CACHE_DIR) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.pdf') or entry.path == keep:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    if keep:
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= REPORT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
 
 
-@app.route('/export_user_data_pdf')
-def export_user_data_pdf():
-    """Export all user data as PDF"""
-    print("🔍 Starting PDF export for user data...")
+def store_report(key, flowables, report_type='other'):
+    """Render a report into the cache under ``key`` and return its path"""
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(REPORT_CACHE_DIR, f'{key}.pdf')
+    partial_path = os.path.join(REPORT_CACHE_DIR, f'.{key}.{os.getpid()}.{threading.get_ident()}.part')
+    try:
+        with open(partial_path, 'wb') as fp:
+            build_pdf(fp, flowables, report_type)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    evict_report_cache(keep=path)
+    return path
+
+
+def lookup_report_key(report_type, username, table_name=None):
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        cur = conn.cursor()
+        key = report_cache_key(cur, report_type, username, table_name)
+        cur.close()
+    return key
 
-    if 'username' not in session:
-        print("❌ User not logged in")
-        return jsonify({'success': False, 'message': 'Not logged in'})
 
-    username = session['username']
-    print(f"📊 Exporting data for user: {username}")
-    print(f"🔤 Amharic font available: {amharic_font_available}")
+def cached_report(report_type, username, table_name, key):
+    """Path of the report cached under ``key``, rendering it first on a miss"""
+    path = get_cached_report(key)
+    if path is None:
+        # Left undated: the file is served until the data changes
+        path = store_report(
+            key, report_flowables(report_type, username, table_name, dated=False), report_type)
+    return path
 
+
+def open_cached_report(report_type, username, table_name, key):
+    """The report cached under ``key``, opened for reading"""
     try:
-        # Create PDF buffer
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
+        return open(cached_report(report_type, username, table_name, key), 'rb')
+    except FileNotFoundError:
+        # Evicted by another request in between; render it again
+        return open(cached_report(report_type, username, table_name, key), 'rb')
+
+
+def report_response(report_type, username, table_name, filename):
+    """PDF download response for a report, served from the cache when possible.
+
+    Returns ``(response, file_size)``. The cache key doubles as the ETag, so a
+    browser revalidating an unchanged report gets a 304 without a render.
+    """
+    key = None
+    if REPORT_CACHE_MAX_BYTES > 0:
+        key = lookup_report_key(report_type, username, table_name)
+    if key is None:
+        spool = render_pdf(report_flowables(report_type, username, table_name), report_type)
+        return pdf_file_response(spool, filename)
+
+    if key in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response, _ = pdf_file_response(
+            open_cached_report(report_type, username, table_name, key), filename)
+    response.set_etag(key)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response, response.content_length or 0
+
+
+def user_report_flowables(username, dated=True):
+    """Story of the per-user data report, one table after another.
+
+    ``dated`` adds the time of rendering under the title.
+    """
+    yield create_paragraph_with_font(f"DATA REPORT - {username}", 16, 1, True)
+    if dated:
+        yield create_paragraph_with_font(
+            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 10, 1)
+    yield Spacer(1, 20)
+
+    with db_connection() as conn:
+        if not conn:
+            logger.error("Database connection failed")
+            yield create_paragraph_with_font(
+                "Error: Could not connect to database", 12, 0)
+            return
 
-        # Add title with font support
-        elements.append(create_paragraph_with_font(
-            f"DATA REPORT - {username}", 16, 1, True))
-        elements.append(create_paragraph_with_font(
-            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 10, 1))
-        elements.append(Spacer(1, 20))
+        try:
+            cur = conn.cursor()
 
-        conn = get_db_connection()
-        if not conn:
-            elements.append(create_paragraph_with_font(
-                "Error: Could not connect to database", 12, 0))
-            print("❌ Database connection failed")
-        else:
-            try:
-                cur = conn.cursor()
+            # Get tables user has permission to access, as report_cache_key
+            # sees them
+            user_tables = list(load_user_permissions(cur, username))
+            logger.debug(f"Found tables: {user_tables}")
 
-                # Get tables user has permission to access
-                cur.execute(
-                    "SELECT table_name FROM user_table_permissions WHERE username = %s", (username,))
-                user_tables = [row[0] for row in cur.fetchall()]
-                print(f"📋 Found tables: {user_tables}")
+            if not user_tables:
+                logger.debug("No tables found for user")
+                yield create_paragraph_with_font("No tables assigned to user", 12, 0)
 
-                if not user_tables:
-                    elements.append(create_paragraph_with_font(
-                        "No tables assigned to user", 12, 0))
-                    print("ℹ️  No tables found for user")
+            parallel = parallel_export_enabled(len(user_tables))
+            for table_name in ([] if parallel else user_tables):
+                logger.debug(f"Processing table: {table_name}")
+                yield create_paragraph_with_font(f"Table: {table_name}", 14, 0, True)
 
-                for table_name in user_tables:
-                    print(f"📄 Processing table: {table_name}")
-                    elements.append(create_paragraph_with_font(
-                        f"Table: {table_name}", 14, 0, True))
+                # A failing table must not abort the transaction for the rest
+                cur.execute("SAVEPOINT export_table")
+                try:
+                    count = yield from iter_table_flowables(conn, table_name, username)
+                    cur.execute("RELEASE SAVEPOINT export_table")
+                    logger.debug(f"Found {count} records in table {table_name}")
+                    yield from table_total_flowables(count)
 
-                    # Get data from table
-                    try:
-                        cur.execute(
-                            f'SELECT * FROM "{table_name}" WHERE submitted_by = %s ORDER BY created_at DESC', (username,))
-                        records = cur.fetchall()
-                        print(
-                            f"📊 Found {len(records)} records in table {table_name}")
-
-                        if records:
-                            # Get column names
-                            cur.execute(f"""
-                                SELECT column_name 
-                                FROM information_schema.columns 
-                                WHERE table_name = %s 
-                                ORDER BY ordinal_position
-                            """, (table_name,))
-                            columns = [safe_string(row[0])
-                                       for row in cur.fetchall()]
-                            print(f"📝 Columns: {columns}")
-
-                            # Prepare table data
-                            table_data = [columns]  # Header row
-
-                            for record in records:
-                                row_data = []
-                                for cell in record:
-                                    if cell is None:
-                                        row_data.append("")
-                                    elif isinstance(cell, (datetime, date)):
-                                        row_data.append(
-                                            cell.strftime('%Y-%m-%d %H:%M:%S'))
-                                    else:
-                                        row_data.append(safe_string(cell))
-                                table_data.append(row_data)
-
-                            # Create and add table
-                            table = create_table_with_font_support(table_data)
-                            if table:
-                                elements.append(table)
-                                elements.append(Spacer(1, 15))
-
-                            elements.append(create_paragraph_with_font(
-                                f"Total records: {len(records)}", 10, 0))
-                        else:
-                            elements.append(create_paragraph_with_font(
-                                "No data in this table", 10, 0))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT export_table")
+                    error_msg = f"Error reading table {table_name}: {str(e)}"
+                    logger.error(error_msg)
+                    yield create_paragraph_with_font(error_msg, 10, 0)
 
-                    except Exception as e:
-                        error_msg = f"Error reading table {table_name}: {str(e)}"
-                        print(f"❌ {error_msg}")
-                        elements.append(
-                            create_paragraph_with_font(error_msg, 10, 0))
+                yield Spacer(1, 20)
 
-                    elements.append(Spacer(1, 20))
+            cur.close()
 
-                cur.close()
-                conn.close()
+        except Exception as e:
+            error_msg = f"Database error: {str(e)}"
+            logger.error(error_msg)
+            yield create_paragraph_with_font(error_msg, 10, 0)
+            return
 
-            except Exception as e:
-                error_msg = f"Database error: {str(e)}"
-                print(f"❌ {error_msg}")
-                elements.append(create_paragraph_with_font(error_msg, 10, 0))
+    # The export processes use their own connections, so this one is
+    # already back in the pool while the tables are being laid out
+    if parallel:
+        yield from parallel_table_flowables(username, user_tables)
 
-        # Build PDF
-        print("📄 Building PDF document...")
-        doc.build(elements)
-        buffer.seek(0)
 
-        file_size = len(buffer.getvalue())
-        print(f"✅ PDF generated successfully! File size: {file_size} bytes")
+def table_total_flowables(count):
+    if count:
+        yield Spacer(1, 15)
+        yield create_paragraph_with_font(f"Total records: {count}", 10, 0)
+    else:
+        yield create_paragraph_with_font("No data in this table", 10, 0)
 
-        return Response(
-            buffer,
-            mimetype="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment;filename=Data_Report_{username}_{datetime.now().strftime('%Y%m%d')}.pdf"}
-        )
+
+def parallel_table_flowables(username, user_tables):
+    """Table sections of the user report, prepared by the export processes"""
+    for table_name, future in iter_prepared_sections(username, user_tables):
+        logger.debug(f"Processing table: {table_name}")
+        yield create_paragraph_with_font(f"Table: {table_name}", 14, 0, True)
+        try:
+            columns, path, count, col_widths = future.result()
+        except Exception as e:
+            error_msg = f"Error reading table {table_name}: {str(e)}"
+            logger.error(error_msg)
+            yield create_paragraph_with_font(error_msg, 10, 0)
+        else:
+            logger.debug(f"Found {count} records in table {table_name}")
+            pages = read_section_pages(path)
+            try:
+                for rows in pages:
+                    yield create_table_with_font_support([columns] + rows, col_widths)
+            finally:
+                # Removes the file even if the report is abandoned midway
+                pages.close()
+            yield from table_total_flowables(count)
+        yield Spacer(1, 20)
+
+
+def form_report_flowables(username, table_name, dated=True):
+    """Story of the report for one form table"""
+    yield create_paragraph_with_font(f"FORM DATA REPORT: {table_name}", 14, 1, True)
+    yield create_paragraph_with_font(f"User: {username}", 10, 1)
+    if dated:
+        yield create_paragraph_with_font(
+            f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", 10, 1)
+    yield Spacer(1, 20)
+
+    with db_connection() as conn:
+        if not conn:
+            yield create_paragraph_with_font("Database connection failed", 10, 0)
+            return
+
+        try:
+            count = yield from iter_table_flowables(conn, table_name, username)
+            logger.debug(f"Found {count} records in table {table_name}")
+            if not count:
+                yield create_paragraph_with_font("No data available", 10, 0)
+
+        except Exception as e:
+            error_msg = f"Error reading table: {str(e)}"
+            logger.error(error_msg)
+            yield create_paragraph_with_font(error_msg, 10, 0)
+
+
+@app.route('/export_user_data_pdf')
+def export_user_data_pdf():
+    """Export all user data as PDF"""
+    logger.debug("Starting PDF export for user data...")
+
+    if 'username' not in session:
+        logger.warning("User not logged in")
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+    logger.debug(f"Exporting data for user: {username}")
+
+    try:
+        logger.debug("Building PDF document...")
+        response, file_size = report_response(
+            'user', username, None,
+            f"Data_Report_{username}_{datetime.now().strftime('%Y%m%d')}.pdf")
+        logger.info(f"PDF generated successfully! File size: {file_size} bytes")
+        return response
 
     except Exception as e:
-        print(f"❌ Critical error in PDF generation: {e}")
+        logger.exception(f"Critical error in PDF generation: {e}")
         # Return a simple error PDF
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
@@ -816,7 +4054,7 @@ def export_user_data_pdf():
 @app.route('/export_form_data_pdf')
 def export_form_data_pdf():
     """Export specific form data as PDF"""
-    print("🔍 Starting form-specific PDF export...")
+    logger.debug("Starting form-specific PDF export...")
 
     if 'username' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
@@ -827,96 +4065,105 @@ def export_form_data_pdf():
     if not table_name:
         return jsonify({'success': False, 'message': 'Table name required'})
 
-    print(f"📊 Exporting table {table_name} for user {username}")
-    print(f"🔤 Amharic font available: {amharic_font_available}")
+    logger.debug(f"Exporting table {table_name} for user {username}")
 
     try:
+        response, file_size = report_response(
+            'form', username, table_name,
+            f"{table_name}_report_{datetime.now().strftime('%Y%m%d')}.pdf")
+        logger.info(
+            f"Form PDF generated successfully! File size: {file_size} bytes")
+        return response
+
+    except Exception as e:
+        logger.exception(f"Critical error in form PDF generation: {e}")
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
         elements = []
-
         elements.append(create_paragraph_with_font(
-            f"FORM DATA REPORT: {table_name}", 14, 1, True))
-        elements.append(create_paragraph_with_font(f"User: {username}", 10, 1))
-        elements.append(create_paragraph_with_font(
-            f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", 10, 1))
-        elements.append(Spacer(1, 20))
-
-        conn = get_db_connection()
-        if conn:
-            try:
-                cur = conn.cursor()
-
-                # Get data
-                cur.execute(
-                    f'SELECT * FROM "{table_name}" WHERE submitted_by = %s ORDER BY created_at DESC', (username,))
-                records = cur.fetchall()
-                print(f"📊 Found {len(records)} records in table {table_name}")
-
-                if records:
-                    # Get column names
-                    cur.execute(f"""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = %s 
-                        ORDER BY ordinal_position
-                    """, (table_name,))
-                    columns = [safe_string(row[0]) for row in cur.fetchall()]
-
-                    # Prepare table data
-                    table_data = [columns]
-                    for record in records:
-                        row_data = []
-                        for cell in record:
-                            if cell is None:
-                                row_data.append("")
-                            elif isinstance(cell, (datetime, date)):
-                                row_data.append(
-                                    cell.strftime('%Y-%m-%d %H:%M:%S'))
-                            else:
-                                row_data.append(safe_string(cell))
-                        table_data.append(row_data)
-
-                    # Create table
-                    table = create_table_with_font_support(table_data)
-                    if table:
-                        elements.append(table)
-                else:
-                    elements.append(create_paragraph_with_font(
-                        "No data available", 10, 0))
-
-                cur.close()
-                conn.close()
-
-            except Exception as e:
-                error_msg = f"Error reading table: {str(e)}"
-                print(f"❌ {error_msg}")
-                elements.append(create_paragraph_with_font(error_msg, 10, 0))
-        else:
-            elements.append(create_paragraph_with_font(
-                "Database connection failed", 10, 0))
-
+            "ERROR GENERATING FORM REPORT", 16, 1, True))
+        elements.append(create_paragraph_with_font(f"Error: {str(e)}", 10, 0))
         doc.build(elements)
         buffer.seek(0)
-
-        file_size = len(buffer.getvalue())
-        print(
-            f"✅ Form PDF generated successfully! File size: {file_size} bytes")
-
         return Response(
             buffer,
             mimetype="application/pdf",
             headers={
-                "Content-Disposition": f"attachment;filename={table_name}_report_{datetime.now().strftime('%Y%m%d')}.pdf"}
+                "Content-Disposition": f"attachment;filename=Error_Form_Report_{datetime.now().strftime('%Y%m%d')}.pdf"}
         )
 
+
+def summary_report_flowables(username, dated=True):
+    """Story of the per-table record count summary"""
+    yield create_paragraph_with_font(f"SUMMARY REPORT - {username}", 16, 1, True)
+    if dated:
+        yield create_paragraph_with_font(
+            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 10, 1)
+    yield Spacer(1, 20)
+
+    with db_connection() as conn:
+        if not conn:
+            yield create_paragraph_with_font("Database connection failed", 10, 0)
+            return
+
+        try:
+            cur = conn.cursor()
+
+            # Counts come from submission_stats, not a scan of every table
+            stats = get_user_table_stats(cur, username)
+            logger.debug(f"Found tables for summary: {[t['table_name'] for t in stats]}")
+
+            summary_data = [['Table Name', 'Record Count']]
+            total_records = 0
+
+            for table in stats:
+                summary_data.append([table['table_name'], str(table['total'])])
+                total_records += table['total']
+
+            cur.close()
+
+        except Exception as e:
+            error_msg = f"Error generating summary: {str(e)}"
+            logger.error(error_msg)
+            yield create_paragraph_with_font(error_msg, 10, 0)
+            return
+
+    # Summary table
+    if len(summary_data) > 1:
+        table = create_table_with_font_support(summary_data)
+        if table:
+            yield table
+            yield Spacer(1, 20)
+        yield create_paragraph_with_font(f"Total Records: {total_records}", 14, 0)
+    else:
+        yield create_paragraph_with_font("No data available", 10, 0)
+
+
+@app.route('/export_summary_pdf')
+def export_summary_pdf():
+    """Export summary report"""
+    logger.debug("Starting summary PDF export...")
+
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
+
+    try:
+        response, file_size = report_response(
+            'summary', username, None,
+            f"Summary_Report_{username}_{datetime.now().strftime('%Y%m%d')}.pdf")
+        logger.info(
+            f"Summary PDF generated successfully! File size: {file_size} bytes")
+        return response
+
     except Exception as e:
-        print(f"❌ Critical error in form PDF generation: {e}")
+        logger.exception(f"Critical error in summary PDF generation: {e}")
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
         elements = []
         elements.append(create_paragraph_with_font(
-            "ERROR GENERATING FORM REPORT", 16, 1, True))
+            "ERROR GENERATING SUMMARY", 16, 1, True))
         elements.append(create_paragraph_with_font(f"Error: {str(e)}", 10, 0))
         doc.build(elements)
         buffer.seek(0)
@@ -924,109 +4171,574 @@ def export_form_data_pdf():
             buffer,
             mimetype="application/pdf",
             headers={
-                "Content-Disposition": f"attachment;filename=Error_Form_Report_{datetime.now().strftime('%Y%m%d')}.pdf"}
+                "Content-Disposition": f"attachment;filename=Error_Summary_{datetime.now().strftime('%Y%m%d')}.pdf"}
         )
 
 
-@app.route('/export_summary_pdf')
-def export_summary_pdf():
-    """Export summary report"""
-    print("🔍 Starting summary PDF export...")
+# Raw data export (CSV / XLSX)
+# For analysts who want the rows rather than a laid-out report. A producer
+# thread writes the file into a bounded queue of chunks that the response
+# drains, so a download holds a few chunks in memory however many rows it
+# has, and a client that stops reading stops the query too
+EXPORT_STREAM_CHUNK_SIZE = 64 * 1024
+EXPORT_STREAM_QUEUE_CHUNKS = 16
+# Seconds the producer waits for a client that stopped reading
+EXPORT_STREAM_TIMEOUT = int(os.environ.get('EXPORT_STREAM_TIMEOUT', 300))
+# Lets Excel recognise the CSV as UTF-8 instead of mangling Amharic text
+CSV_BOM = b'\xef\xbb\xbf'
+# Rows per worksheet Excel can open, header included
+XLSX_MAX_ROWS = 1048576
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_TITLE_CHARACTERS = str.maketrans({c: '_' for c in '[]:*?/\\'})
+
+
+class ExportCancelled(Exception):
+    """The client went away while an export was still being written"""
+
+
+class QueueWriter(io.RawIOBase):
+    """Write end of a streamed download: every write becomes a chunk on a bounded queue"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.cancelled = threading.Event()
+
+    def writable(self):
+        return True
+
+    def put(self, item):
+        waited = 0
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                waited += 1
+                if waited >= EXPORT_STREAM_TIMEOUT:
+                    raise ExportCancelled()
+
+    def write(self, data):
+        self.put(bytes(data))
+        return len(data)
+
+
+def stream_export(produce):
+    """Run ``produce(fp)`` in a thread and yield what it writes to ``fp`` in chunks.
+
+    If the producer fails part-way the generator raises, so the server
+    drops the connection rather than ending a truncated file cleanly.
+    """
+    chunks = queue.Queue(maxsize=EXPORT_STREAM_QUEUE_CHUNKS)
+    writer = QueueWriter(chunks)
+    # A profiled request's SQL includes what the producer runs
+    profile_statements = getattr(_profile_local, 'statements', None)
+
+    def run():
+        if profile_statements is not None:
+            _profile_local.statements = profile_statements
+        outcome = None
+        try:
+            with io.BufferedWriter(writer, EXPORT_STREAM_CHUNK_SIZE) as fp:
+                produce(fp)
+        except ExportCancelled:
+            return
+        except Exception as e:
+            logger.exception(f"Export failed: {e}")
+            outcome = e
+        try:
+            writer.put(outcome)
+        except ExportCancelled:
+            pass
+
+    threading.Thread(target=run, name='export-producer', daemon=True).start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise RuntimeError(f"Export failed: {chunk}")
+            yield chunk
+    finally:
+        writer.cancelled.set()
+
+
+def copy_table_csv(cur, table_name, username, fp):
+    """Write the user's rows of ``table_name`` to ``fp`` as UTF-8 CSV, newest first"""
+    fp.write(CSV_BOM)
+    copy_query = sql.SQL("""
+        COPY (SELECT * FROM {} WHERE submitted_by = {} ORDER BY created_at DESC, id DESC)
+        TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')
+    """).format(sql.Identifier(table_name), sql.Literal(username))
+    cur.copy_expert(copy_query.as_string(cur), fp, size=EXPORT_STREAM_CHUNK_SIZE)
+    EXPORT_ROWS.inc('csv', table_name, amount=max(cur.rowcount, 0))
+
+
+def xlsx_sheet_title(table_name, used):
+    """A worksheet title for ``table_name``: at most 31 characters, legal and unique"""
+    base = title = table_name.translate(XLSX_TITLE_CHARACTERS)[:31] or 'Sheet'
+    number = 2
+    while title.lower() in used:
+        suffix = f' ({number})'
+        title = base[:31 - len(suffix)] + suffix
+        number += 1
+    used.add(title.lower())
+    return title
+
+
+def xlsx_value(value):
+    if isinstance(value, str):
+        # Control characters make the sheet unreadable to Excel
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def write_xlsx(fp, username, table_names):
+    """Write the user's rows of each table to ``fp`` as a workbook, one sheet per table"""
+    workbook = Workbook(write_only=True)
+    used_titles = set()
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        for table_name in table_names:
+            cur = conn.cursor()
+            columns = [col['name'] for col in get_table_schema(cur, table_name)]
+            cur.close()
+            if not columns:
+                continue
+
+            # Write-only sheets spool their rows to temp files, not memory
+            sheet = workbook.create_sheet(xlsx_sheet_title(table_name, used_titles))
+            sheet.append(columns)
+            count = 1
+            for record in iter_table_records(conn, table_name, username):
+                if count == XLSX_MAX_ROWS:
+                    logger.warning(f"Truncated {table_name} at {XLSX_MAX_ROWS} rows in XLSX export")
+                    break
+                sheet.append([xlsx_value(value) for value in record])
+                count += 1
+            EXPORT_ROWS.inc('xlsx', table_name, amount=count - 1)
+    if not used_titles:
+        workbook.create_sheet('No data')
+    workbook.save(fp)
+
+
+def raw_export_response(produce, filename, mimetype):
+    return Response(stream_export(produce), mimetype=mimetype,
+                    headers=attachment_headers(filename))
+
+
+def existing_user_tables(username):
+    """Tables the user has been granted that exist, in name order"""
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        cur = conn.cursor()
+        tables = [table_name for table_name in get_user_permissions(username, cur)
+                  if get_table_schema(cur, table_name)]
+        cur.close()
+    return tables
+
 
+def form_export_table():
+    """The table_name of a form export request, or an error response"""
+    table_name = request.args.get('table_name', '')
+    if not table_name:
+        return None, jsonify({'success': False, 'message': 'Table name required'})
+    with db_connection() as conn:
+        if not conn:
+            return None, jsonify({'success': False, 'message': 'Database connection failed'})
+        cur = conn.cursor()
+        exists = bool(get_table_schema(cur, table_name))
+        cur.close()
+    if not exists:
+        return None, jsonify({'success': False, 'message': 'Table not found'})
+    return table_name, None
+
+
+@app.route('/export_form_data_csv')
+def export_form_data_csv():
+    """Export the user's rows of one form as CSV"""
     if 'username' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
 
     username = session['username']
-    print(f"🔤 Amharic font available: {amharic_font_available}")
+    table_name, error = form_export_table()
+    if error:
+        return error
+
+    def produce(fp):
+        with db_connection() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            copy_table_csv(conn.cursor(), table_name, username, fp)
 
+    return raw_export_response(
+        produce, f"{table_name}_{datetime.now().strftime('%Y%m%d')}.csv",
+        'text/csv; charset=utf-8')
+
+
+@app.route('/export_user_data_csv')
+def export_user_data_csv():
+    """Export all of the user's rows as a ZIP with one CSV per form"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    username = session['username']
     try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
+        user_tables = existing_user_tables(username)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+    if not user_tables:
+        return jsonify({'success': False, 'message': 'No tables assigned to user'})
+
+    def produce(fp):
+        with db_connection() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cur = conn.cursor()
+            # ZipFile streams to a non-seekable file, one member at a time
+            with zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for table_name in user_tables:
+                    member_name = f"{table_name.replace('/', '_')}.csv"
+                    with archive.open(member_name, 'w', force_zip64=True) as member:
+                        copy_table_csv(cur, table_name, username, member)
 
-        elements.append(create_paragraph_with_font(
-            f"SUMMARY REPORT - {username}", 16, 1, True))
-        elements.append(create_paragraph_with_font(
-            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 10, 1))
-        elements.append(Spacer(1, 20))
+    return raw_export_response(
+        produce, f"Data_{username}_{datetime.now().strftime('%Y%m%d')}.zip",
+        'application/zip')
+
+
+@app.route('/export_form_data_xlsx')
+def export_form_data_xlsx():
+    """Export the user's rows of one form as an Excel workbook"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    if Workbook is None:
+        return jsonify({'success': False, 'message': 'Excel export is not available (openpyxl is not installed)'})
+
+    username = session['username']
+    table_name, error = form_export_table()
+    if error:
+        return error
+
+    return raw_export_response(
+        lambda fp: write_xlsx(fp, username, [table_name]),
+        f"{table_name}_{datetime.now().strftime('%Y%m%d')}.xlsx", XLSX_MIMETYPE)
+
+
+@app.route('/export_user_data_xlsx')
+def export_user_data_xlsx():
+    """Export all of the user's rows as an Excel workbook, one sheet per form"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    if Workbook is None:
+        return jsonify({'success': False, 'message': 'Excel export is not available (openpyxl is not installed)'})
+
+    username = session['username']
+    try:
+        user_tables = existing_user_tables(username)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+    if not user_tables:
+        return jsonify({'success': False, 'message': 'No tables assigned to user'})
+
+    return raw_export_response(
+        lambda fp: write_xlsx(fp, username, user_tables),
+        f"Data_{username}_{datetime.now().strftime('%Y%m%d')}.xlsx", XLSX_MIMETYPE)
+
+
+# Background report jobs
+# /enqueue_report records a job in report_jobs and hands it to a process
+# pool (ReportLab layout is CPU-bound and holds the GIL); the browser polls
+# /report_status and fetches the file from /download_report when done.
+# Jobs live in Postgres, so `flask --app app report-worker` on another
+# machine can drain the same queue; SKIP LOCKED keeps workers apart.
+REPORT_JOBS_DIR = os.environ.get('REPORT_JOBS_DIR', os.path.join(app.instance_path, 'reports'))
+# Render processes per web worker; 0 leaves every job to `report-worker`
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+# Running jobs older than this are assumed dead and handed out again
+REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT', 30 * 60))
+# Finished reports (and their files) are deleted after this many seconds
+REPORT_JOB_RETENTION = int(os.environ.get('REPORT_JOB_RETENTION', 24 * 60 * 60))
+
+REPORT_TYPES = ('user', 'form', 'summary')
+
+_report_executor = None
+_report_executor_pid = None
+_report_executor_lock = threading.Lock()
+
+
+def report_flowables(report_type, username, table_name=None, dated=True):
+    """Story generator for a report type"""
+    if report_type == 'user':
+        return user_report_flowables(username, dated)
+    if report_type == 'form':
+        return form_report_flowables(username, table_name, dated)
+    if report_type == 'summary':
+        return summary_report_flowables(username, dated)
+    raise ValueError(f'Unknown report type: {report_type}')
+
+
+def report_filename(report_type, username, table_name, day):
+    if report_type == 'user':
+        return f"Data_Report_{username}_{day.strftime('%Y%m%d')}.pdf"
+    if report_type == 'form':
+        return f"{table_name}_report_{day.strftime('%Y%m%d')}.pdf"
+    return f"Summary_Report_{username}_{day.strftime('%Y%m%d')}.pdf"
+
+
+def claim_report_job(cur, job_id=None):
+    """Mark a queued job (or a stale running one) as running and return it"""
+    if job_id is None:
+        target = sql.SQL("""(
+            SELECT id FROM report_jobs
+            WHERE status = 'queued'
+               OR (status = 'running' AND started_at < now() - make_interval(secs => %s))
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1)""")
+        params = [REPORT_JOB_TIMEOUT]
+    else:
+        target = sql.SQL("%s")
+        params = [job_id]
+    cur.execute(sql.SQL("""
+        UPDATE report_jobs SET status = 'running', started_at = now()
+        WHERE id = {target} AND status IN ('queued', 'running')
+        RETURNING id, username, report_type, table_name
+    """).format(target=target), params)
+    return cur.fetchone()
+
+
+def purge_expired_report_jobs(cur):
+    cur.execute("""
+        DELETE FROM report_jobs
+        WHERE finished_at < now() - make_interval(secs => %s)
+        RETURNING file_path
+    """, (REPORT_JOB_RETENTION,))
+    for (file_path,) in cur.fetchall():
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def run_report_job(job_id=None):
+    """Render one report job; runs inside a report worker process.
+
+    Claims ``job_id`` (or the oldest claimable job when None) and returns
+    the id of the job it handled, or None when there was nothing to do.
+    """
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        cur = conn.cursor()
+        job = claim_report_job(cur, job_id)
+        conn.commit()
+        cur.close()
+    if not job:
+        return None
+
+    job_id, username, report_type, table_name = job
+    logger.debug(f"Rendering {report_type} report job {job_id} for {username}")
+    os.makedirs(REPORT_JOBS_DIR, exist_ok=True)
+    file_path = os.path.join(REPORT_JOBS_DIR, f'{job_id}.pdf')
+    partial_path = file_path + '.part'
+    try:
+        key = None
+        if REPORT_CACHE_MAX_BYTES > 0:
+            key = lookup_report_key(report_type, username, table_name)
+        if key is not None:
+            with open_cached_report(report_type, username, table_name, key) as cached:
+                # A hard link survives the cache evicting its copy
+                try:
+                    os.link(cached.name, partial_path)
+                except OSError:
+                    with open(partial_path, 'wb') as fp:
+                        shutil.copyfileobj(cached, fp)
+        else:
+            with open(partial_path, 'wb') as fp:
+                build_pdf(fp, report_flowables(report_type, username, table_name), report_type)
+        os.replace(partial_path, file_path)
+        result = ('done', file_path, os.path.getsize(file_path), None)
+        logger.info(f"Report job {job_id} finished: {result[2]} bytes")
+    except Exception as e:
+        logger.exception(f"Report job {job_id} failed: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        result = ('failed', None, None, str(e))
+
+    with db_connection() as conn:
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE report_jobs
+            SET status = %s, file_path = %s, file_size = %s, error = %s, finished_at = now()
+            WHERE id = %s
+        """, (*result, job_id))
+        purge_expired_report_jobs(cur)
+        conn.commit()
+        cur.close()
+    return job_id
+
+
+def get_report_executor():
+    """This process's pool of report render processes, or None if disabled"""
+    global _report_executor, _report_executor_pid
+    if REPORT_WORKERS <= 0:
+        return None
+    pid = os.getpid()
+    if _report_executor is None or _report_executor_pid != pid:
+        with _report_executor_lock:
+            if _report_executor is None or _report_executor_pid != pid:
+                # spawn, not fork: forking a threaded web worker can copy
+                # held locks and live database sockets into the child
+                _report_executor = ProcessPoolExecutor(
+                    max_workers=REPORT_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_helper_process)
+                _report_executor_pid = pid
+    return _report_executor
+
+
+def report_job_json(row):
+    job_id, report_type, table_name, status, file_size, error, created_at, finished_at = row
+    return {
+        'job_id': job_id,
+        'report_type': report_type,
+        'table_name': table_name,
+        'status': status,
+        'file_size': file_size,
+        'error': error,
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else None,
+        'finished_at': finished_at.strftime('%Y-%m-%d %H:%M:%S') if finished_at else None,
+        'download_url': url_for('download_report', job_id=job_id) if status == 'done' else None,
+    }
+
+
+@app.route('/enqueue_report', methods=['POST'])
+def enqueue_report():
+    """Queue a user, form or summary PDF report for background rendering"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+
+    data = request.json or {}
+    report_type = data.get('reportType')
+    table_name = data.get('tableName') or None
+    if report_type not in REPORT_TYPES:
+        return jsonify({'success': False, 'message': f'Report type must be one of: {", ".join(REPORT_TYPES)}'})
+    if report_type == 'form' and not table_name:
+        return jsonify({'success': False, 'message': 'Table name required'})
 
-        conn = get_db_connection()
+    username = session['username']
+    with db_connection() as conn:
         if conn:
             try:
                 cur = conn.cursor()
+                cur.execute("""
+                    INSERT INTO report_jobs (username, report_type, table_name)
+                    VALUES (%s, %s, %s) RETURNING id
+                """, (username, report_type, table_name))
+                job_id = cur.fetchone()[0]
+                conn.commit()
+                cur.close()
+            except Exception as e:
+                conn.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+        else:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
 
-                # Get user tables
-                cur.execute(
-                    "SELECT table_name FROM user_table_permissions WHERE username = %s", (username,))
-                user_tables = [row[0] for row in cur.fetchall()]
-                print(f"📋 Found tables for summary: {user_tables}")
+    executor = get_report_executor()
+    if executor:
+        executor.submit(run_report_job, job_id)
 
-                summary_data = [['Table Name', 'Record Count']]
-                total_records = 0
+    return jsonify({'success': True, 'job_id': job_id, 'message': 'Report queued',
+                    'status_url': url_for('report_status', job_id=job_id)})
 
-                for table_name in user_tables:
-                    # Get actual record count
-                    cur.execute(
-                        f'SELECT COUNT(*) FROM "{table_name}" WHERE submitted_by = %s', (username,))
-                    actual_count = cur.fetchone()[0]
-                    summary_data.append([table_name, str(actual_count)])
-                    total_records += actual_count
-                    print(f"📊 Table {table_name}: {actual_count} records")
-
-                # Summary table
-                if len(summary_data) > 1:
-                    table = create_table_with_font_support(summary_data)
-                    if table:
-                        elements.append(table)
-                        elements.append(Spacer(1, 20))
-                    elements.append(create_paragraph_with_font(
-                        f"Total Records: {total_records}", 14, 0))
-                else:
-                    elements.append(create_paragraph_with_font(
-                        "No data available", 10, 0))
 
-                cur.close()
-                conn.close()
+@app.route('/report_status/<int:job_id>')
+def report_status(job_id):
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
 
+    with db_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT id, report_type, table_name, status, file_size, error, created_at, finished_at
+                    FROM report_jobs WHERE id = %s AND username = %s
+                """, (job_id, session['username']))
+                row = cur.fetchone()
+                cur.close()
+                if not row:
+                    return jsonify({'success': False, 'message': 'Report not found'})
+                return jsonify({'success': True, 'job': report_job_json(row)})
             except Exception as e:
-                error_msg = f"Error generating summary: {str(e)}"
-                print(f"❌ {error_msg}")
-                elements.append(create_paragraph_with_font(error_msg, 10, 0))
-        else:
-            elements.append(create_paragraph_with_font(
-                "Database connection failed", 10, 0))
+                return jsonify({'success': False, 'message': str(e)})
 
-        doc.build(elements)
-        buffer.seek(0)
+        return jsonify({'success': False, 'message': 'Database connection failed'})
 
-        file_size = len(buffer.getvalue())
-        print(
-            f"✅ Summary PDF generated successfully! File size: {file_size} bytes")
 
-        return Response(
-            buffer,
-            mimetype="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment;filename=Summary_Report_{username}_{datetime.now().strftime('%Y%m%d')}.pdf"}
-        )
+@app.route('/download_report/<int:job_id>')
+def download_report(job_id):
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
 
-    except Exception as e:
-        print(f"❌ Critical error in summary PDF generation: {e}")
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        elements.append(create_paragraph_with_font(
-            "ERROR GENERATING SUMMARY", 16, 1, True))
-        elements.append(create_paragraph_with_font(f"Error: {str(e)}", 10, 0))
-        doc.build(elements)
-        buffer.seek(0)
-        return Response(
-            buffer,
-            mimetype="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment;filename=Error_Summary_{datetime.now().strftime('%Y%m%d')}.pdf"}
-        )
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'})
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT report_type, table_name, status, file_path, created_at
+            FROM report_jobs WHERE id = %s AND username = %s
+        """, (job_id, session['username']))
+        row = cur.fetchone()
+        cur.close()
+
+    if not row:
+        return jsonify({'success': False, 'message': 'Report not found'})
+    report_type, table_name, status, file_path, created_at = row
+    if status != 'done' or not file_path or not os.path.exists(file_path):
+        return jsonify({'success': False, 'message': f'Report is not ready (status: {status})'})
+
+    response, _ = pdf_file_response(
+        open(file_path, 'rb'),
+        report_filename(report_type, session['username'], table_name, created_at))
+    return response
+
+
+@app.cli.command('report-worker')
+@click.option('--processes', default=max(REPORT_WORKERS, 1), show_default=True,
+              help='Reports rendered in parallel.')
+@click.option('--poll-interval', default=2.0, show_default=True,
+              help='Seconds to sleep when the queue is empty.')
+def report_worker_command(processes, poll_interval):
+    """Render queued PDF reports until interrupted."""
+    click.echo(f"Report worker started with {processes} processes")
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=init_helper_process) as executor:
+        running = set()
+        while True:
+            while len(running) < processes:
+                running.add(executor.submit(run_report_job))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+
+            handled = False
+            for future in done:
+                try:
+                    handled = future.result() is not None or handled
+                except Exception as e:
+                    click.echo(f"Report job error: {e}", err=True)
+            if not handled:
+                time.sleep(poll_interval)
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Development server only; production runs under gunicorn with
+    # gunicorn.conf.py, which applies migrations in its master process
+    apply_migrations()
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1',
+            port=int(os.environ.get('PORT', 5000)))
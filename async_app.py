@@ -0,0 +1,470 @@
+"""ASGI entry point: ``uvicorn async_app:app``
+
+The read endpoints every dashboard calls on load (/get_user_tables,
+/get_table_columns, /get_user_submissions, /get_tables, /get_users) are
+served here with asyncpg, so a worker keeps hundreds of them waiting on
+Postgres at once instead of one per thread. They share app.py's schema
+and permission caches, and with them the NOTIFY invalidation, so a hit
+costs at most the session lookup. Every other route is handed to the
+Flask app on a thread pool.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import asyncpg
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.middleware import Middleware
+from starlette.routing import Match, Mount, Route
+from werkzeug.http import parse_etags, quote_etag
+
+import app as dashboard
+
+logger = logging.getLogger(__name__)
+
+# asyncpg pool per worker process. Idle async connections are cheap, so
+# the ceiling can sit well above the threaded pool's
+ASYNC_DB_POOL_MIN = int(os.environ.get('ASYNC_DB_POOL_MIN', 2))
+ASYNC_DB_POOL_MAX = int(os.environ.get('ASYNC_DB_POOL_MAX', 50))
+# Threads running the Flask routes that aren't served natively
+ASYNC_WSGI_THREADS = int(os.environ.get('ASYNC_WSGI_THREADS', 10))
+
+_pool = None
+
+# Statements run by the native request being profiled, if any (see
+# RequestProfileMiddleware). asyncpg calls query loggers in a copy of the
+# context that ran the query, so they see the request's list.
+_profile_statements = contextvars.ContextVar('profile_statements', default=None)
+
+
+async def init_connection(conn):
+    await conn.set_type_codec('json', schema='pg_catalog',
+                              encoder=json.dumps, decoder=json.loads)
+
+
+@asynccontextmanager
+async def lifespan(starlette_app):
+    global _pool
+    _pool = await asyncpg.create_pool(
+        **dashboard.DB_CONFIG, min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX,
+        init=init_connection)
+    dashboard.start_invalidation_listener()
+    try:
+        yield
+    finally:
+        await _pool.close()
+        dashboard.close_db_pool()
+
+
+@asynccontextmanager
+async def db_connection():
+    """Borrow a pooled connection; yields None if the database is unreachable"""
+    try:
+        conn = await _pool.acquire(timeout=dashboard.DB_POOL_CONFIG['timeout'])
+    except (OSError, asyncpg.PostgresError, asyncio.TimeoutError) as e:
+        logger.error(f"Database connection error: {e}")
+        conn = None
+    profiled = conn is not None and _profile_statements.get() is not None
+    if profiled:
+        conn.add_query_logger(record_profile_statement)
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            if profiled:
+                conn.remove_query_logger(record_profile_statement)
+            await _pool.release(conn)
+
+
+def record_profile_statement(query):
+    statements = _profile_statements.get()
+    if statements is None:
+        return
+    sql = f'{query.query} -- {query.args!r}' if query.args else query.query
+    statements.append({'statement': dashboard.statement_type(query.query),
+                       'seconds': query.elapsed,
+                       'sql': sql[:dashboard.PROFILE_STATEMENT_MAX_CHARS]})
+
+
+def pg_query(query):
+    """Rewrite a psycopg2 query shared with app.py to asyncpg's $n placeholders"""
+    parts = query.split('%s')
+    return parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], 1))
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def json_response(payload, status_code=200):
+    # Serialize exactly as Flask's jsonify does
+    return Response(dashboard.app.json.dumps(payload) + '\n', status_code=status_code,
+                    media_type='application/json')
+
+
+async def session_username(request):
+    """Username of the request's Flask session, or None.
+
+    Reads the session without touching it; its expiry is pushed back by
+    the Flask routes the dashboards also call.
+    """
+    flask_app = dashboard.app
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return None
+
+    interface = flask_app.session_interface
+    if isinstance(interface, dashboard.PostgresSessionInterface):
+        sid = interface.session_id(flask_app, cookie)
+        if sid is None:
+            return None
+        async with db_connection() as conn:
+            if conn is None:
+                return None
+            row = await conn.fetchrow(pg_query(dashboard.SESSION_LOAD_QUERY), sid)
+        if row is None:
+            return None
+        data = interface.serializer.loads(row['data'])
+    else:
+        serializer = interface.get_signing_serializer(flask_app)
+        try:
+            data = serializer.loads(
+                cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return None
+    return data.get('username')
+
+
+# Cached lookups. Mirror get_table_schema, get_form_definition and
+# get_user_permissions in app.py, and fill the same caches.
+
+async def get_table_schema(conn, table_name):
+    schema = dashboard._table_schemas.get(table_name)
+    if schema is not None:
+        return schema
+
+    generation = dashboard._table_schemas_generation
+    rows = await conn.fetch(pg_query(dashboard.TABLE_SCHEMA_QUERY), table_name)
+    schema = dashboard.table_schema_from_rows(rows)
+    dashboard.cache_table_schema(table_name, schema, generation)
+    return schema
+
+
+async def get_form_definition(table_name):
+    definition = dashboard._form_definitions.get(table_name)
+    if definition is not None:
+        return definition
+
+    generation = dashboard._table_schemas_generation
+    async with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError('Database connection failed')
+        form_columns = [col for col in await get_table_schema(conn, table_name)
+                        if col['name'] not in dashboard.SYSTEM_COLUMNS]
+        rows = await conn.fetch(pg_query(dashboard.FORM_DROPDOWN_OPTIONS_QUERY), table_name)
+    definition = dashboard.build_form_definition(form_columns, rows)
+    dashboard.cache_form_definition(table_name, definition, generation)
+    return definition
+
+
+async def get_user_permissions(conn, username):
+    permissions = dashboard.cached_user_permissions(username)
+    if permissions is not None:
+        return permissions
+
+    generation = dashboard._user_permissions_generation
+    rows = await conn.fetch(pg_query(dashboard.USER_PERMISSIONS_QUERY), username)
+    permissions = dashboard.permissions_from_rows(rows)
+    dashboard.cache_user_permissions(username, permissions, generation)
+    return permissions
+
+
+# Endpoints. Same URLs and responses as the Flask routes they replace.
+
+async def get_users(request):
+    async with db_connection() as conn:
+        if conn:
+            try:
+                rows = await conn.fetch("SELECT username FROM system_users ORDER BY username")
+                return json_response({'success': True, 'users': [row[0] for row in rows]})
+            except Exception as e:
+                return json_response({'success': False, 'message': str(e)})
+
+    return json_response({'success': False, 'message': 'Database connection failed'})
+
+
+async def get_tables(request):
+    async with db_connection() as conn:
+        if conn:
+            try:
+                rows = await conn.fetch(pg_query(dashboard.DYNAMIC_TABLES_QUERY),
+                                        list(dashboard.SYSTEM_TABLES))
+                return json_response({'success': True, 'tables': [row[0] for row in rows]})
+            except Exception as e:
+                return json_response({'success': False, 'message': str(e)})
+
+    return json_response({'success': False, 'message': 'Database connection failed'})
+
+
+async def get_user_tables(request):
+    username = await session_username(request)
+    if username is None:
+        return json_response({'success': False, 'message': 'Not logged in'})
+
+    permissions = dashboard.cached_user_permissions(username)
+    if permissions is None:
+        async with db_connection() as conn:
+            if not conn:
+                return json_response({'success': False, 'message': 'Database connection failed'})
+            try:
+                permissions = await get_user_permissions(conn, username)
+            except Exception as e:
+                return json_response({'success': False, 'message': str(e)})
+
+    tables = [table_name for table_name, grant in permissions.items() if grant['can_write']]
+    return json_response({'success': True, 'tables': tables})
+
+
+async def get_table_columns(request):
+    try:
+        definition = await get_form_definition(request.path_params['table_name'])
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)})
+
+    headers = {'ETag': quote_etag(definition['etag']), 'Cache-Control': 'no-cache'}
+    if parse_etags(request.headers.get('if-none-match')).contains(definition['etag']):
+        return Response(status_code=304, headers=headers)
+    response = json_response({
+        'success': True,
+        'columns': definition['columns'],
+        'dropdownOptions': definition['dropdownOptions']
+    })
+    response.headers.update(headers)
+    return response
+
+
+async def get_user_submissions(request):
+    username = await session_username(request)
+    if username is None:
+        return json_response({'success': False, 'message': 'Not logged in'})
+
+    try:
+        limit = int(request.query_params.get('limit', dashboard.SUBMISSIONS_PAGE_SIZE))
+    except ValueError:
+        limit = dashboard.SUBMISSIONS_PAGE_SIZE
+    limit = max(1, min(limit, dashboard.SUBMISSIONS_MAX_PAGE_SIZE))
+    after = None
+    if request.query_params.get('cursor'):
+        try:
+            after_at, after_table, after_id = dashboard.decode_cursor(
+                request.query_params['cursor'])
+            after = (datetime.fromisoformat(after_at), after_table, int(after_id))
+        except (ValueError, TypeError):
+            return json_response({'success': False, 'message': 'Invalid cursor'})
+
+    async with db_connection() as conn:
+        if conn:
+            try:
+                user_tables = [table_name
+                               for table_name in await get_user_permissions(conn, username)
+                               if await get_table_schema(conn, table_name)]
+                if not user_tables:
+                    return json_response({'success': True, 'submissions': [],
+                                          'next_cursor': None})
+
+                # Same keyset query as the Flask route; see the comments there
+                params = []
+
+                def param(value):
+                    params.append(value)
+                    return f'${len(params)}'
+
+                subqueries = []
+                for table in user_tables:
+                    condition = ''
+                    if after:
+                        after_at, after_table, after_id = after
+                        if table == after_table:
+                            condition = f' AND (created_at, id) < ({param(after_at)}, {param(after_id)})'
+                        elif table < after_table:
+                            condition = f' AND created_at <= {param(after_at)}'
+                        else:
+                            condition = f' AND created_at < {param(after_at)}'
+                    subqueries.append(
+                        f"(SELECT {param(table)}::text COLLATE \"C\" AS table_name, id, created_at "
+                        f"FROM {quote_ident(table)} "
+                        f"WHERE submitted_by = {param(username)}{condition} "
+                        f"ORDER BY created_at DESC, id DESC LIMIT {param(limit + 1)})")
+
+                query = ' UNION ALL '.join(subqueries) + (
+                    f' ORDER BY created_at DESC, table_name DESC, id DESC'
+                    f' LIMIT {param(limit + 1)}')
+                rows = await conn.fetch(query, *params)
+
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    last_table, last_id, last_at = rows[-1]
+                    next_cursor = dashboard.encode_cursor([last_at, last_table, last_id])
+
+                submissions = [{
+                    'table': table,
+                    'record_id': record_id,
+                    'submitted_at': created_at.strftime('%Y-%m-%d %H:%M:%S') if created_at else None
+                } for table, record_id, created_at in rows]
+
+                return json_response({'success': True, 'submissions': submissions,
+                                      'next_cursor': next_cursor})
+
+            except Exception as e:
+                return json_response({'success': False, 'message': str(e)})
+
+    return json_response({'success': False, 'message': 'Database connection failed'})
+
+
+NATIVE_ROUTES = [
+    Route('/get_users', get_users),
+    Route('/get_tables', get_tables),
+    Route('/get_user_tables', get_user_tables),
+    Route('/get_table_columns/{table_name}', get_table_columns),
+    Route('/get_user_submissions', get_user_submissions),
+]
+
+
+def native_route(scope):
+    """The native route ``scope`` is for, written the way Flask writes rules, or None"""
+    if scope['type'] != 'http':
+        return None
+    for candidate in NATIVE_ROUTES:
+        if candidate.matches(scope)[0] == Match.FULL:
+            return re.sub(r'\{(\w+)\}', r'<\1>', candidate.path)
+    return None
+
+
+class RequestMetricsMiddleware:
+    """Record the native routes in app.py's request metrics.
+
+    Requests passed through to Flask are recorded by its own hooks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = native_route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            dashboard.HTTP_REQUESTS.inc(scope['method'], route, str(status))
+            dashboard.HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started, scope['method'], route)
+
+
+class RequestProfileMiddleware:
+    """Profile the native routes as app.py's start_request_profile does Flask's.
+
+    Always uses the stack sampler: cProfile can't follow a coroutine across
+    its awaits, so X-Profile-Mode is ignored. The sampler watches the event
+    loop's thread, so the stacks include other requests served meanwhile;
+    the statements are this request's alone. Requests passed through to
+    Flask are profiled by its own hooks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = None
+        if dashboard.PROFILE_TOKEN or dashboard.PROFILE_SAMPLE_RATE:
+            route = native_route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if dashboard.has_profile_token(Headers(scope=scope).get('x-profile')):
+            reason = 'requested'
+        elif dashboard.PROFILE_SAMPLE_RATE and random.random() < dashboard.PROFILE_SAMPLE_RATE:
+            reason = 'sampled'
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = dashboard.new_profile_id()
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = [*message.get('headers', []),
+                                      (b'x-profile-id', profile_id.encode('ascii'))]
+            await send(message)
+
+        profiler = dashboard.StackSampler(threading.get_ident())
+        profiler.enable()
+        statements = []
+        token = _profile_statements.set(statements)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = time.perf_counter() - started
+            _profile_statements.reset(token)
+            profiler.disable()
+
+        query = scope['query_string'].decode('latin-1')
+        profile = {
+            'id': profile_id,
+            'reason': reason,
+            'mode': 'sampling',
+            'profiler': profiler,
+            'statements': statements,
+            'started': started,
+            'method': scope['method'],
+            'path': scope['path'] + (f'?{query}' if query else ''),
+            'route': route,
+            'username': await session_username(Request(scope)),
+            'status': status,
+        }
+        # Let the query loggers asyncpg has queued record the last statements
+        await asyncio.sleep(0)
+        try:
+            await asyncio.to_thread(dashboard.save_profile, profile, duration)
+        except Exception as e:
+            logger.error(f"Could not save profile {profile_id}: {e}")
+
+
+app = Starlette(
+    routes=[
+        *NATIVE_ROUTES,
+        Mount('/', WSGIMiddleware(dashboard.app, workers=ASYNC_WSGI_THREADS)),
+    ],
+    middleware=[Middleware(RequestMetricsMiddleware), Middleware(RequestProfileMiddleware)],
+    lifespan=lifespan,
+)
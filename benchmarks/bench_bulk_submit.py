@@ -0,0 +1,157 @@
+"""Benchmark form submission throughput, single-row against bulk.
+
+Creates a form table for a benchmark user and submits ``--rows`` rows
+three ways through the Flask test client: one /submit_form_data request
+per row, and /submit_form_data_bulk with JSON batches and with CSV
+uploads of ``--batch`` rows. Prints rows per second for each.
+
+    python benchmarks/bench_bulk_submit.py --rows 2000 --batch 500
+
+Run it from the repository root against a migrated database. Pass
+``--drop`` to remove the fixture table afterwards.
+"""
+import argparse
+import csv
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import sql
+
+import app as dashboard
+
+BENCH_USER = 'bench_submit_user'
+BENCH_TABLE = 'bench_submit'
+COLUMNS = [
+    ('full_name', 'VARCHAR(255)'),
+    ('age', 'INTEGER'),
+    ('registered', 'BOOLEAN'),
+    ('visit_date', 'DATE'),
+    ('amount', 'DECIMAL(10,2)'),
+    ('notes', 'TEXT'),
+]
+
+
+def make_row(i):
+    return {
+        'full_name': f'ነዋሪ {i}',
+        'age': str(18 + i % 60),
+        'registered': 'true' if i % 2 else 'false',
+        'visit_date': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}',
+        'amount': f'{i % 1000}.{i % 100:02d}',
+        'notes': 'ማስታወሻ ' * (i % 4),
+    }
+
+
+def seed():
+    with dashboard.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(BENCH_TABLE)))
+        cur.execute(sql.SQL(
+            'CREATE TABLE {} (id SERIAL PRIMARY KEY, {}, '
+            'created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, submitted_by VARCHAR(100))'
+        ).format(sql.Identifier(BENCH_TABLE),
+                 sql.SQL(', ').join(sql.SQL('{} ' + col_type).format(sql.Identifier(name))
+                                    for name, col_type in COLUMNS)))
+        dashboard.create_dynamic_table_indexes(cur, BENCH_TABLE)
+        cur.execute("""
+            INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
+            VALUES (%s, %s, TRUE, TRUE)
+            ON CONFLICT (username, table_name) DO NOTHING
+        """, (BENCH_USER, BENCH_TABLE))
+        conn.commit()
+        cur.close()
+    dashboard.invalidate_table_schema(BENCH_TABLE)
+
+
+def drop():
+    with dashboard.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM user_table_permissions WHERE username = %s", (BENCH_USER,))
+        cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(BENCH_TABLE)))
+        conn.commit()
+        cur.close()
+    dashboard.invalidate_table_schema(BENCH_TABLE)
+
+
+def count_rows():
+    with dashboard.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql.SQL('SELECT COUNT(*) FROM {}').format(sql.Identifier(BENCH_TABLE)))
+        count = cur.fetchone()[0]
+        cur.close()
+    return count
+
+
+def check(response):
+    result = response.get_json()
+    if not result.get('success'):
+        raise SystemExit(f'Submission failed: {result}')
+
+
+def submit_single(client, rows):
+    for row in rows:
+        check(client.post('/submit_form_data',
+                          json={'tableName': BENCH_TABLE, 'formData': row}))
+
+
+def submit_json(client, rows, batch):
+    for start in range(0, len(rows), batch):
+        check(client.post('/submit_form_data_bulk',
+                          json={'tableName': BENCH_TABLE, 'rows': rows[start:start + batch]}))
+
+
+def submit_csv(client, rows, batch):
+    for start in range(0, len(rows), batch):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=[name for name, _ in COLUMNS])
+        writer.writeheader()
+        writer.writerows(rows[start:start + batch])
+        check(client.post('/submit_form_data_bulk', data={
+            'tableName': BENCH_TABLE,
+            'file': (io.BytesIO(buffer.getvalue().encode('utf-8')), 'rows.csv'),
+        }, content_type='multipart/form-data'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--drop', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger('app').setLevel(logging.WARNING)
+    seed()
+    rows = [make_row(i) for i in range(args.rows)]
+    client = dashboard.app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = BENCH_USER
+
+    try:
+        baseline = None
+        for label, run in [
+            ('single-row', lambda: submit_single(client, rows)),
+            (f'bulk JSON x{args.batch}', lambda: submit_json(client, rows, args.batch)),
+            (f'bulk CSV x{args.batch}', lambda: submit_csv(client, rows, args.batch)),
+        ]:
+            before = count_rows()
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            inserted = count_rows() - before
+            rate = inserted / elapsed
+            baseline = baseline or rate
+            print(f'{label:>16}: {inserted} rows in {elapsed:.2f}s, '
+                  f'{rate:,.0f} rows/s ({rate / baseline:.1f}x)')
+    finally:
+        if args.drop:
+            drop()
+        dashboard.close_db_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Check that the parallel user report keeps the web process's memory bounded.
+
+Renders the per-user PDF report the way /export_user_data_pdf does, once
+through the export processes and once through the serial streaming path,
+each in a fresh process, and compares how far each raised the process's
+peak resident memory. reportlab keeps the pages of a document until it
+is saved, so both grow with the PDF. But the parallel path must not add
+more than ``--max-extra-mb`` on top, however many rows the tables hold;
+the script exits with status 1 if it does.
+
+    python benchmarks/bench_seed.py --tables 2 --columns 8 --rows 100000 --users 1
+    EXPORT_PARALLEL_WORKERS=2 python benchmarks/bench_export_memory.py --username bench_load_user_000
+
+Needs at least two tables readable by the user (parallel export only
+kicks in then) and EXPORT_PARALLEL_WORKERS above 1.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as dashboard
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(username, parallel):
+    """Render the report in this process; returns (peak memory growth in MB, seconds)"""
+    if parallel:
+        # Start the export processes first; their start-up isn't the report's
+        dashboard.get_export_executor().submit(int).result()
+    else:
+        dashboard.EXPORT_PARALLEL_WORKERS = 1
+    before = peak_rss_mb()
+    started = time.perf_counter()
+    spool = dashboard.render_pdf(dashboard.user_report_flowables(username), 'user')
+    elapsed = time.perf_counter() - started
+    spool.close()
+    return peak_rss_mb() - before, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--username', default='bench_load_user_000')
+    parser.add_argument('--max-extra-mb', type=float, default=20,
+                        help='memory the parallel path may use beyond the serial one')
+    parser.add_argument('--measure', choices=['serial', 'parallel'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.getLogger('app').setLevel(logging.WARNING)
+    if args.measure:
+        growth, elapsed = measure(args.username, args.measure == 'parallel')
+        dashboard.close_db_pool()
+        print(json.dumps({'growth_mb': growth, 'seconds': elapsed}))
+        return
+
+    with dashboard.db_connection() as conn:
+        if not conn:
+            raise SystemExit('Database connection failed')
+        cur = conn.cursor()
+        tables = list(dashboard.get_user_permissions(args.username, cur))
+        rows = sum(table['total'] for table in dashboard.get_user_table_stats(cur, args.username))
+        cur.close()
+    dashboard.close_db_pool()
+    if not dashboard.parallel_export_enabled(len(tables)):
+        raise SystemExit(f'{args.username} has {len(tables)} tables and EXPORT_PARALLEL_WORKERS '
+                         f'is {dashboard.EXPORT_PARALLEL_WORKERS}; parallel export is not used')
+
+    results = {}
+    for mode in ('serial', 'parallel'):
+        output = subprocess.run([sys.executable, __file__, '--username', args.username,
+                                 '--measure', mode],
+                                capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+        print(f'{mode:>8}: peak memory grew {results[mode]["growth_mb"]:.1f} MB '
+              f'in {results[mode]["seconds"]:.1f}s')
+
+    extra = results['parallel']['growth_mb'] - results['serial']['growth_mb']
+    print(f'{rows} rows in {len(tables)} tables: parallel export used {extra:+.1f} MB '
+          f'beyond the streaming path (limit {args.max_extra_mb:.0f} MB)')
+    if extra > args.max_extra_mb:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark the per-user PDF export, serial against parallel table preparation.
+
+Seeds ``--tables`` form tables of ``--rows`` rows each for a benchmark user,
+then renders that user's report with one process and with
+``--workers`` export processes and prints the timings.
+
+    python benchmarks/bench_export_parallel.py --tables 6 --rows 5000
+
+Run it from the repository root against a database that has been migrated
+(``flask --app app migrate``). Pass ``--drop`` to remove the fixture tables
+afterwards.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+import app as dashboard
+
+BENCH_USER = 'bench_export_user'
+COLUMNS = ['full_name', 'kebele', 'phone', 'notes']
+
+
+def table_names(count):
+    return [f'bench_export_{i:02d}' for i in range(count)]
+
+
+def seed(tables, rows):
+    with dashboard.db_connection() as conn:
+        cur = conn.cursor()
+        for table_name in tables:
+            cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+            cur.execute(sql.SQL(
+                'CREATE TABLE {} (id SERIAL PRIMARY KEY, {}, '
+                'created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, submitted_by VARCHAR(100))'
+            ).format(sql.Identifier(table_name),
+                     sql.SQL(', ').join(sql.SQL('{} TEXT').format(sql.Identifier(c))
+                                        for c in COLUMNS)))
+            dashboard.create_dynamic_table_indexes(cur, table_name)
+            execute_values(cur, sql.SQL('INSERT INTO {} ({}, submitted_by) VALUES %s').format(
+                sql.Identifier(table_name),
+                sql.SQL(', ').join(map(sql.Identifier, COLUMNS))).as_string(cur),
+                [(f'ነዋሪ {i}', f'ቀበሌ {i % 24}', f'09{i:08d}', 'ማስታወሻ ' * (i % 5), BENCH_USER)
+                 for i in range(rows)], page_size=1000)
+            cur.execute("""
+                INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
+                VALUES (%s, %s, TRUE, TRUE)
+                ON CONFLICT (username, table_name) DO NOTHING
+            """, (BENCH_USER, table_name))
+        conn.commit()
+        cur.close()
+
+
+def drop(tables):
+    with dashboard.db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM user_table_permissions WHERE username = %s", (BENCH_USER,))
+        for table_name in tables:
+            cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+        conn.commit()
+        cur.close()
+
+
+def render(workers):
+    dashboard.EXPORT_PARALLEL_WORKERS = workers
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        spool = dashboard.render_pdf(dashboard.user_report_flowables(BENCH_USER))
+    elapsed = time.perf_counter() - started
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.close()
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tables', type=int, default=6)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=dashboard.EXPORT_PARALLEL_WORKERS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--drop', action='store_true')
+    args = parser.parse_args()
+
+    tables = table_names(args.tables)
+    if not args.skip_seed:
+        print(f'Seeding {args.tables} tables x {args.rows} rows...')
+        seed(tables, args.rows)
+
+    # Start the export processes outside the timed runs
+    if args.workers > 1:
+        dashboard.EXPORT_PARALLEL_WORKERS = args.workers
+        list(dashboard.get_export_executor().map(abs, range(args.workers)))
+
+    try:
+        results = {}
+        for workers in (1, args.workers):
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, size = render(workers)
+                timings.append(elapsed)
+            results[workers] = min(timings)
+            print(f'workers={workers}: best {min(timings):.2f}s of {args.repeat}, '
+                  f'{size / 1024:.0f} KiB')
+        print(f'speedup: {results[1] / results[args.workers]:.2f}x')
+    finally:
+        if args.drop:
+            drop(tables)
+        dashboard.close_db_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Load-test the dashboard's hot endpoints and write the results as JSON.
+
+Drives a running server with ``--concurrency`` simulated users, each
+logged in as one of bench_seed.py's users. For every scenario it sends
+``--requests`` requests after ``--warmup`` untimed ones, then reports
+throughput and p50/p90/p99 latency. The scenarios are:
+
+    login               POST /login
+    table_columns       GET  /get_table_columns/<table>
+    submit              POST /submit_form_data
+    submissions         GET  /get_user_submissions
+    form_pdf            GET  /export_form_data_pdf
+    user_pdf            GET  /export_user_data_pdf
+    summary_pdf         GET  /export_summary_pdf
+
+    python benchmarks/bench_seed.py --tables 5 --rows 20000 --users 20
+    LOGIN_RATE_PER_ADDRESS=1000000 gunicorn -c gunicorn.conf.py app:app &
+    python benchmarks/bench_load.py --base-url http://127.0.0.1:8000 \\
+        --concurrency 16 --requests 200 --output results.json
+
+Start the server with LOGIN_RATE_PER_ADDRESS raised as above, or the
+login scenario turns into a test of the throttle. PDF scenarios measure
+the report cache unless the server runs with REPORT_CACHE_MAX_BYTES=0.
+
+``--compare baseline.json`` prints each scenario's change from an
+earlier run. The exit status is 1 when throughput fell, or p99 grew, by
+more than ``--threshold``.
+
+Only the standard library is needed on the machine running the load, so
+nothing is imported from bench_seed.py; the names below must match it.
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# As in bench_seed.py
+TABLE_PREFIX = 'bench_load_form_'
+USER_PREFIX = 'bench_load_user_'
+BENCH_PASSWORD = 'bench-load-password'
+WORDS = ['ሰላም', 'ጎንደር', 'ከተማ', 'ውሃ', 'መንገድ', 'water', 'road', 'school', 'clinic', 'market']
+
+SCENARIOS = ['login', 'table_columns', 'submit', 'submissions',
+             'form_pdf', 'user_pdf', 'summary_pdf']
+
+
+class Client:
+    """One simulated user: a cookie jar and a logged-in session"""
+
+    def __init__(self, base_url, username, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, payload=None):
+        """Send a request and read the whole body; returns (status, body)"""
+        data, headers = None, {}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self):
+        status, body = self.request('/login', {'username': self.username,
+                                               'password': BENCH_PASSWORD})
+        return status == 200 and json.loads(body).get('success')
+
+
+def table_names(count):
+    return [f'{TABLE_PREFIX}{i:02d}' for i in range(count)]
+
+
+def user_names(count):
+    return [f'{USER_PREFIX}{i:03d}' for i in range(count)]
+
+
+def json_success(status, body):
+    return status == 200 and json.loads(body).get('success')
+
+
+def form_values(columns, rng):
+    """Submission values for a form's columns, as the browser would send them"""
+    values = {}
+    for column in columns:
+        col_type = column['type']
+        if col_type == 'integer':
+            values[column['name']] = str(rng.randint(0, 100000))
+        elif col_type == 'date':
+            values[column['name']] = f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        elif col_type == 'numeric':
+            values[column['name']] = f'{rng.uniform(0, 10000):.2f}'
+        else:
+            values[column['name']] = ' '.join(rng.choice(WORDS) for _ in range(3))
+    return values
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.tables = table_names(args.tables)
+        self.users = user_names(args.users)
+        self.local = threading.local()
+        self.client_numbers = itertools.count()
+        self.columns = {}
+
+    def client(self):
+        """This thread's logged-in client"""
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            number = next(self.client_numbers)
+            client = Client(self.args.base_url, self.users[number % len(self.users)],
+                            self.args.timeout)
+            if not client.login():
+                raise SystemExit(f'Could not log in as {client.username}; run bench_seed.py first')
+            self.local.client = client
+            self.local.rng = random.Random(number)
+        return client
+
+    def run_once(self, scenario):
+        """Perform one request of ``scenario``; returns whether it succeeded"""
+        if scenario == 'login':
+            client = Client(self.args.base_url, random.choice(self.users), self.args.timeout)
+            return client.login()
+
+        client = self.client()
+        rng = self.local.rng
+        table_name = rng.choice(self.tables)
+        if scenario == 'table_columns':
+            return json_success(*client.request(f'/get_table_columns/{table_name}'))
+        if scenario == 'submit':
+            return json_success(*client.request('/submit_form_data', {
+                'tableName': table_name,
+                'formData': form_values(self.columns[table_name], rng),
+            }))
+        if scenario == 'submissions':
+            return json_success(*client.request('/get_user_submissions'))
+        if scenario == 'form_pdf':
+            status, body = client.request(f'/export_form_data_pdf?table_name={table_name}')
+        elif scenario == 'user_pdf':
+            status, body = client.request('/export_user_data_pdf')
+        else:
+            status, body = client.request('/export_summary_pdf')
+        return status == 200 and body.startswith(b'%PDF')
+
+    def timed(self, scenario):
+        started = time.perf_counter()
+        try:
+            ok = self.run_once(scenario)
+        except (OSError, ValueError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def load_columns(self):
+        client = Client(self.args.base_url, self.users[0], self.args.timeout)
+        if not client.login():
+            raise SystemExit(f'Could not log in as {client.username}; run bench_seed.py first')
+        for table_name in self.tables:
+            status, body = client.request(f'/get_table_columns/{table_name}')
+            self.columns[table_name] = json.loads(body)['columns']
+
+    def run(self, scenario):
+        args = self.args
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(self.timed, [scenario] * args.warmup))
+            started = time.perf_counter()
+            outcomes = list(pool.map(self.timed, [scenario] * args.requests))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds * 1000 for seconds, _ in outcomes)
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        errors = sum(1 for _, ok in outcomes if not ok)
+        return {
+            'requests': len(outcomes),
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(len(outcomes) / elapsed, 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(cuts[49], 2),
+            'p90_ms': round(cuts[89], 2),
+            'p99_ms': round(cuts[98], 2),
+            'max_ms': round(latencies[-1], 2),
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change from a baseline run; returns whether anything regressed"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f'\nAgainst {baseline_path} ({baseline["meta"].get("git_commit")}):')
+    regressed = False
+    for scenario, current in results.items():
+        before = baseline['results'].get(scenario)
+        if not before:
+            continue
+        throughput = current['throughput_rps'] / before['throughput_rps'] - 1
+        p99 = current['p99_ms'] / before['p99_ms'] - 1
+        worse = throughput < -threshold or p99 > threshold
+        regressed |= worse
+        print(f'{scenario:>14}: throughput {throughput:+.1%}, p99 {p99:+.1%}'
+              f'{"  REGRESSION" if worse else ""}')
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per scenario')
+    parser.add_argument('--tables', type=int, default=5, help='as given to bench_seed.py')
+    parser.add_argument('--users', type=int, default=20, help='as given to bench_seed.py')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='an earlier --output file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change that counts as a regression')
+    args = parser.parse_args()
+
+    test = LoadTest(args)
+    test.load_columns()
+    results = {}
+    print(f'{"scenario":>14} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>9} {"errors":>7}')
+    for scenario in args.scenarios:
+        result = results[scenario] = test.run(scenario)
+        print(f'{scenario:>14} {result["throughput_rps"]:>8.1f} {result["p50_ms"]:>8.1f} '
+              f'{result["p90_ms"]:>8.1f} {result["p99_ms"]:>9.1f} {result["errors"]:>7}')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'tables': args.tables,
+            'users': args.users,
+            'python': platform.python_version(),
+            'host': platform.node(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
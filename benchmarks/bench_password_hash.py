@@ -0,0 +1,99 @@
+"""Benchmark password hashing costs to pick PASSWORD_SCRYPT_N.
+
+Times verify_password at each scrypt cost in ``--costs`` (log2 of N) and
+reports p50/p99 per login, plus the login rate ``--workers`` processes
+could sustain at that cost. The recommended cost is the highest one
+whose p99 fits ``--budget-ms`` while ``--peak-rate`` logins per second
+keep the hashing processes at most 70% busy. Finally it times /login
+requests that the rate limiter turns away, to show what throttled
+brute-force attempts cost.
+
+    python benchmarks/bench_password_hash.py --peak-rate 20 --budget-ms 250
+
+Needs no database: throttled logins are turned away before the query.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as dashboard
+
+MAX_UTILISATION = 0.7
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_verify(hasher, samples):
+    stored = dashboard.hash_password('correct horse battery staple', hasher)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        dashboard.verify_password('correct horse battery staple', stored)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def time_throttled_logins(requests):
+    client = dashboard.app.test_client()
+    limiter = dashboard.login_address_limiter
+    # Spend the test client's whole allowance first
+    while not limiter.hit('127.0.0.1'):
+        pass
+    started = time.perf_counter()
+    for i in range(requests):
+        response = client.post('/login', json={'username': f'bench_{i}', 'password': 'guess'})
+        if response.status_code != 429:
+            raise SystemExit(f'Expected 429, got {response.status_code}')
+    return (time.perf_counter() - started) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15, 16],
+                        help='log2 of scrypt N to try')
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--peak-rate', type=float, default=20,
+                        help='logins per second at peak')
+    parser.add_argument('--budget-ms', type=float, default=250,
+                        help='p99 hashing time allowed per login')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='processes sharing the login load')
+    parser.add_argument('--skip-login', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger('app').setLevel(logging.ERROR)
+    recommended = None
+    print(f'{"N":>8} {"p50 ms":>8} {"p99 ms":>8} {"max logins/s":>13}  fits')
+    for cost in args.costs:
+        hasher = dashboard.ScryptHasher(n=2 ** cost)
+        timings = time_verify(hasher, args.samples)
+        p50, p99 = statistics.median(timings), percentile(timings, 0.99)
+        capacity = args.workers * 1000 / p50
+        fits = p99 <= args.budget_ms and args.peak_rate <= capacity * MAX_UTILISATION
+        if fits:
+            recommended = cost
+        print(f'{2 ** cost:>8} {p50:>8.1f} {p99:>8.1f} {capacity:>13.0f}  {"yes" if fits else "no"}')
+
+    legacy = time_verify(dashboard.Pbkdf2Hasher(), max(5, args.samples // 3))
+    print(f'(pbkdf2_sha256 x{dashboard.PASSWORD_PBKDF2_ITERATIONS}: '
+          f'p50 {statistics.median(legacy):.1f} ms)')
+
+    if recommended is None:
+        print('No cost fits; add workers or raise --budget-ms')
+    else:
+        print(f'Recommended: PASSWORD_SCRYPT_N={2 ** recommended}')
+
+    if not args.skip_login:
+        print(f'Throttled /login: {time_throttled_logins(200):.2f} ms per request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Seed synthetic form tables and users for the load test.
+
+Creates ``--tables`` form tables with ``--columns`` columns each, the way
+/create_table does (standard indexes and submission counters included),
+plus ``--users`` users who may read and write every table. It then fills
+the tables with ``--rows`` rows each, spread evenly over the users and
+over the past year. Text values mix Amharic and Latin words. The same
+``--seed`` always gives the same data.
+
+    python benchmarks/bench_seed.py --tables 5 --columns 8 --rows 20000 --users 20
+
+Run it from the repository root against a migrated database. ``--drop``
+removes everything it created. The users log in with BENCH_PASSWORD.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+import app as dashboard
+
+TABLE_PREFIX = 'bench_load_form_'
+USER_PREFIX = 'bench_load_user_'
+BENCH_PASSWORD = 'bench-load-password'
+COLUMN_TYPES = ['VARCHAR(255)', 'INTEGER', 'DATE', 'DECIMAL(10,2)', 'TEXT']
+AMHARIC_WORDS = ['ሰላም', 'ጎንደር', 'ከተማ', 'ውሃ', 'መንገድ', 'ትምህርት', 'ጤና', 'ገበያ', 'ቀበሌ', 'ነዋሪ']
+LATIN_WORDS = ['water', 'road', 'school', 'clinic', 'market', 'kebele', 'resident', 'permit']
+
+
+def table_names(count):
+    return [f'{TABLE_PREFIX}{i:02d}' for i in range(count)]
+
+
+def user_names(count):
+    return [f'{USER_PREFIX}{i:03d}' for i in range(count)]
+
+
+def column_specs(count):
+    return [(f'field_{i:02d}', COLUMN_TYPES[i % len(COLUMN_TYPES)]) for i in range(count)]
+
+
+def text_value(rng, amharic_ratio, words=3):
+    return ' '.join(rng.choice(AMHARIC_WORDS if rng.random() < amharic_ratio else LATIN_WORDS)
+                    for _ in range(words))
+
+
+def column_value(rng, col_type, amharic_ratio):
+    """A random value for a column; the load test sends the same kinds as strings"""
+    if col_type == 'INTEGER':
+        return rng.randint(0, 100000)
+    if col_type == 'DATE':
+        return (datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 730))).date()
+    if col_type.startswith('DECIMAL'):
+        return round(rng.uniform(0, 10000), 2)
+    if col_type == 'TEXT':
+        return text_value(rng, amharic_ratio, rng.randint(3, 12))
+    return text_value(rng, amharic_ratio)
+
+
+def create_users(cur, users):
+    password = dashboard.hash_password(BENCH_PASSWORD)
+    execute_values(cur, """
+        INSERT INTO system_users (username, password, email) VALUES %s
+        ON CONFLICT (username) DO UPDATE SET password = EXCLUDED.password
+    """, [(username, password, f'{username}@example.com') for username in users])
+
+
+def create_table(cur, table_name, columns):
+    cur.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+    cur.execute(sql.SQL(
+        'CREATE TABLE {} (id SERIAL PRIMARY KEY, {}, '
+        'created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, submitted_by VARCHAR(100))'
+    ).format(sql.Identifier(table_name),
+             sql.SQL(', ').join(sql.SQL('{} ' + col_type).format(sql.Identifier(name))
+                                for name, col_type in columns)))
+    dashboard.create_dynamic_table_indexes(cur, table_name)
+    dashboard.create_submission_stats_triggers(cur, table_name)
+
+
+def fill_table(cur, table_name, columns, users, rows, rng, amharic_ratio):
+    insert = sql.SQL('INSERT INTO {} ({}, created_at, submitted_by) VALUES %s').format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(sql.Identifier(name) for name, _ in columns)).as_string(cur)
+    now = datetime.now()
+    batch = []
+    for i in range(rows):
+        created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        batch.append((*(column_value(rng, col_type, amharic_ratio) for _, col_type in columns),
+                      created_at, users[i % len(users)]))
+        if len(batch) == 5000:
+            execute_values(cur, insert, batch, page_size=1000)
+            batch = []
+    if batch:
+        execute_values(cur, insert, batch, page_size=1000)
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    tables, users = table_names(args.tables), user_names(args.users)
+    columns = column_specs(args.columns)
+    with dashboard.db_connection() as conn:
+        if not conn:
+            raise SystemExit('Database connection failed')
+        cur = conn.cursor()
+        create_users(cur, users)
+        for table_name in tables:
+            started = time.perf_counter()
+            create_table(cur, table_name, columns)
+            fill_table(cur, table_name, columns, users, args.rows, rng, args.amharic_ratio)
+            execute_values(cur, """
+                INSERT INTO user_table_permissions (username, table_name, can_read, can_write)
+                VALUES %s ON CONFLICT (username, table_name) DO NOTHING
+            """, [(username, table_name, True, True) for username in users])
+            cur.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(table_name)))
+            conn.commit()
+            print(f'{table_name}: {args.rows} rows in {time.perf_counter() - started:.1f}s')
+        # A running server drops what it cached about these tables and users
+        dashboard.publish_invalidation(cur, 'schema', None)
+        dashboard.publish_invalidation(cur, 'permissions', None)
+        conn.commit()
+        cur.close()
+
+
+def drop(args):
+    with dashboard.db_connection() as conn:
+        if not conn:
+            raise SystemExit('Database connection failed')
+        cur = conn.cursor()
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename LIKE %s",
+                    (TABLE_PREFIX + '%',))
+        for (table_name,) in cur.fetchall():
+            cur.execute(sql.SQL('DROP TABLE {}').format(sql.Identifier(table_name)))
+        for table in ('user_table_permissions', 'submission_stats', 'table_data_versions'):
+            cur.execute(sql.SQL('DELETE FROM {} WHERE table_name LIKE %s').format(
+                sql.Identifier(table)), (TABLE_PREFIX + '%',))
+        cur.execute("DELETE FROM system_users WHERE username LIKE %s", (USER_PREFIX + '%',))
+        dashboard.publish_invalidation(cur, 'schema', None)
+        dashboard.publish_invalidation(cur, 'permissions', None)
+        conn.commit()
+        cur.close()
+    print('Dropped the benchmark tables and users')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tables', type=int, default=5)
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=20000, help='rows per table')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--amharic-ratio', type=float, default=0.7,
+                        help='share of text words that are Amharic')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--drop', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger('app').setLevel(logging.WARNING)
+    try:
+        if args.drop:
+            drop(args)
+        else:
+            seed(args)
+    finally:
+        dashboard.close_db_pool()
+
+
+if __name__ == '__main__':
+    main()
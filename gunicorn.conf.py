@@ -0,0 +1,61 @@
+"""Production server settings: ``gunicorn -c gunicorn.conf.py app:app``
+
+Every setting can be overridden from the environment (see README.md).
+Defaults: one worker process per core, each with GUNICORN_THREADS request
+threads. PDF rendering already runs in separate process pools, so
+workers mostly wait on the database and threads are cheap concurrency.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app (fonts, config) once in the master; workers are forked
+# from it and share those pages copy-on-write
+preload_app = True
+
+# A worker silent for this long is killed and replaced. With gthread the
+# heartbeat is separate from request handling, so slow exports don't trip it
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+# On SIGHUP/SIGTERM, workers get this long to finish in-flight requests
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    import app
+
+    app.clear_metrics_dir()
+    if os.environ.get('RUN_MIGRATIONS', '1') == '1':
+        app.apply_migrations()
+    # Retiring old partitions is left to the scheduled maintain-partitions
+    app.maintain_partitions(retire=False)
+    # Workers must not inherit the master's database sockets
+    app.close_db_pool()
+
+
+def pre_fork(server, worker):
+    import app
+
+    app.close_db_pool()
+
+
+def post_fork(server, worker):
+    import app
+
+    # Open the worker's DB_POOL_MIN connections before it takes requests
+    app.get_db_pool()
+    # Its caches are filled once it listens for invalidations
+    app.start_invalidation_listener()
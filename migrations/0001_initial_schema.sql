@@ -0,0 +1,31 @@
+-- Core application tables.
+-- IF NOT EXISTS lets databases created before migrations existed adopt
+-- this version without changes.
+
+CREATE TABLE IF NOT EXISTS system_users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) UNIQUE NOT NULL,
+    password VARCHAR(100) NOT NULL,
+    email VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_table_permissions (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    can_read BOOLEAN DEFAULT TRUE,
+    can_write BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(username, table_name)
+);
+
+CREATE TABLE IF NOT EXISTS table_dropdown_options (
+    id SERIAL PRIMARY KEY,
+    table_name VARCHAR(100) NOT NULL,
+    column_name VARCHAR(100) NOT NULL,
+    option_value VARCHAR(255) NOT NULL,
+    option_label VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(table_name, column_name, option_value)
+);
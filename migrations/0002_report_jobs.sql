@@ -0,0 +1,19 @@
+-- Queue of background PDF report jobs (see /enqueue_report).
+
+CREATE TABLE IF NOT EXISTS report_jobs (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    report_type VARCHAR(20) NOT NULL,
+    table_name VARCHAR(100),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    file_path TEXT,
+    file_size BIGINT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Workers only ever look for claimable jobs
+CREATE INDEX IF NOT EXISTS report_jobs_pending_idx
+    ON report_jobs (id) WHERE status IN ('queued', 'running');
@@ -0,0 +1,45 @@
+-- Per-table, per-submitter, per-day record counts of the dynamic tables,
+-- so summaries don't have to COUNT(*) every table. Kept up to date by the
+-- statement-level triggers create_table attaches to each dynamic table;
+-- run `flask --app app backfill-stats` once for tables created before this.
+
+CREATE TABLE IF NOT EXISTS submission_stats (
+    table_name VARCHAR(100) NOT NULL,
+    submitted_by VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    record_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, submitted_by, day)
+);
+
+-- Applies one statement's inserted/deleted rows to the counters, grouped
+-- so a bulk insert touches each (submitter, day) counter once. Counters
+-- are locked in key order to keep concurrent statements from deadlocking.
+CREATE OR REPLACE FUNCTION submission_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE submission_stats s
+        SET record_count = s.record_count - d.record_count
+        FROM (
+            SELECT submitted_by, created_at::date AS day, COUNT(*) AS record_count
+            FROM old_rows
+            WHERE submitted_by IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY 1, 2
+        ) d
+        WHERE s.table_name = TG_TABLE_NAME
+          AND s.submitted_by = d.submitted_by AND s.day = d.day;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO submission_stats (table_name, submitted_by, day, record_count)
+        SELECT TG_TABLE_NAME, submitted_by, created_at::date, COUNT(*)
+        FROM new_rows
+        WHERE submitted_by IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY 2, 3
+        ORDER BY 2, 3
+        ON CONFLICT (table_name, submitted_by, day)
+        DO UPDATE SET record_count = submission_stats.record_count + EXCLUDED.record_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,57 @@
+-- A version number per (table, submitter) that changes whenever that
+-- submitter's rows of the table change. Rendered reports are cached under
+-- the versions of the data they show (see the report cache in app.py).
+-- Bumped by the same statement-level triggers that keep submission_stats.
+
+CREATE TABLE IF NOT EXISTS table_data_versions (
+    table_name VARCHAR(100) NOT NULL,
+    submitted_by VARCHAR(100) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 1,
+    PRIMARY KEY (table_name, submitted_by)
+);
+
+CREATE OR REPLACE FUNCTION submission_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE submission_stats s
+        SET record_count = s.record_count - d.record_count
+        FROM (
+            SELECT submitted_by, created_at::date AS day, COUNT(*) AS record_count
+            FROM old_rows
+            WHERE submitted_by IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY 1, 2
+        ) d
+        WHERE s.table_name = TG_TABLE_NAME
+          AND s.submitted_by = d.submitted_by AND s.day = d.day;
+
+        INSERT INTO table_data_versions (table_name, submitted_by)
+        SELECT DISTINCT TG_TABLE_NAME, submitted_by
+        FROM old_rows
+        WHERE submitted_by IS NOT NULL
+        ORDER BY 2
+        ON CONFLICT (table_name, submitted_by)
+        DO UPDATE SET version = table_data_versions.version + 1;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO submission_stats (table_name, submitted_by, day, record_count)
+        SELECT TG_TABLE_NAME, submitted_by, created_at::date, COUNT(*)
+        FROM new_rows
+        WHERE submitted_by IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY 2, 3
+        ORDER BY 2, 3
+        ON CONFLICT (table_name, submitted_by, day)
+        DO UPDATE SET record_count = submission_stats.record_count + EXCLUDED.record_count;
+
+        INSERT INTO table_data_versions (table_name, submitted_by)
+        SELECT DISTINCT TG_TABLE_NAME, submitted_by
+        FROM new_rows
+        WHERE submitted_by IS NOT NULL
+        ORDER BY 2
+        ON CONFLICT (table_name, submitted_by)
+        DO UPDATE SET version = table_data_versions.version + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,11 @@
+-- Server-side sessions (see PostgresSessionInterface in app.py). The
+-- session cookie holds only the signed session_id. Rows past expires_at
+-- are ignored, and deleted by the periodic sweep or `flask sweep-sessions`.
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    session_id VARCHAR(64) PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions (expires_at);
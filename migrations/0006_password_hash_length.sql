@@ -0,0 +1,4 @@
+-- Salted KDF hashes ("<scheme>$<parameters>$<salt>$<hash>") outgrow the
+-- 64-character SHA-256 digests the column was sized for.
+
+ALTER TABLE system_users ALTER COLUMN password TYPE VARCHAR(255);
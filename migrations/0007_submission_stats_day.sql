@@ -0,0 +1,5 @@
+-- The admin overview sums submission_stats over the most recent days
+-- across all tables; the primary key leads with table_name and can't
+-- serve that range.
+
+CREATE INDEX IF NOT EXISTS idx_submission_stats_day ON submission_stats (day);
@@ -0,0 +1,15 @@
+-- Form tables /create_table made range-partitioned on created_at, and the
+-- policy `flask maintain-partitions` applies to each: how many periods of
+-- partitions to create ahead, and how many past periods to keep before
+-- archiving (detaching into another schema) or dropping the oldest.
+
+CREATE TABLE IF NOT EXISTS partitioned_tables (
+    table_name VARCHAR(100) PRIMARY KEY,
+    partition_interval VARCHAR(10) NOT NULL
+        CHECK (partition_interval IN ('day', 'month', 'year')),
+    premake INTEGER NOT NULL DEFAULT 3 CHECK (premake BETWEEN 0 AND 60),
+    retention_periods INTEGER CHECK (retention_periods > 0),
+    retention_action VARCHAR(10) NOT NULL DEFAULT 'archive'
+        CHECK (retention_action IN ('archive', 'drop')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);